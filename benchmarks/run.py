@@ -0,0 +1,323 @@
+######################################### benchmarks/run.py #########################################
+#                                                                                                      #
+#                Benchmarks for the scrape pipeline, HTTP stubbed out so it runs offline               #
+#                                                                                                      #
+#   python benchmarks/run.py run --games 200 --output before.json                                     #
+#   python benchmarks/run.py compare before.json after.json                                           #
+#   python benchmarks/run.py load --games 200 --latency 0.05 --error-rate 0.02 (against mock_server.py)#
+#   python benchmarks/run.py record 1-60      (needs network, saves real feeds to benchmarks/fixtures) #
+#                                                                                                      #
+########################################################################################################
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import requests
+
+from pwhl_pbp_scraper import feeds, scraper, synthetic, transport
+from pwhl_pbp_scraper.cache import FileCache
+from pwhl_pbp_scraper.mock_server import start_mock_server
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+# metrics compare looks at, everything else in the results is context
+METRIC_SUFFIXES = ('_ms', '_s', '_mib')
+
+# pandas dtype warnings from the cleaning stages would drown out the results
+warnings.simplefilter('ignore', FutureWarning)
+
+############################################# Stub HTTP ################################################
+class StubResponse:
+    def __init__(self, url, text, status_code=200):
+        self.url = url
+        self.text = text
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError("{} for url {}".format(self.status_code, self.url), response=self)
+
+
+class StubSession:
+    '''
+    StubSession - Stands in for requests.Session, answers the exact urls fetch_feed asks for from memory
+    '''
+    def __init__(self, games):
+        self.bodies = {}
+        for game_id, (pbp_text, misc_text) in games.items():
+            self.bodies[scraper.FEED_URLS['gameCenterPlayByPlay'].format(game_id)] = pbp_text
+            self.bodies[scraper.FEED_URLS['gameSummary'].format(game_id)] = misc_text
+
+    def get(self, url, **kwargs):
+        if url not in self.bodies:
+            return StubResponse(url, '', 404)
+        return StubResponse(url, self.bodies[url])
+
+############################################# Game sources #############################################
+def synthetic_games(n, events_per_period=80, first_id=1):
+    # a mix of regulation, OT and shootout games with penalty shots and goalie pulls
+    return {game_id: synthetic.game_feeds(game_id, events_per_period) for game_id in range(first_id, first_id + n)}
+
+def recorded_games(directory=FIXTURES):
+    cache = FileCache(directory)
+    games = {}
+    for game_id in cache.game_ids('gameCenterPlayByPlay'):
+        pbp_text = cache.get('gameCenterPlayByPlay', game_id, stale_ok=True)
+        misc_text = cache.get('gameSummary', game_id, stale_ok=True)
+        if misc_text is not None:
+            games[game_id] = (pbp_text, misc_text)
+    return games
+
+def record(game_ids, directory=FIXTURES):
+    # download real feeds into the fixtures directory, same layout as FileCache
+    games, failures = scraper.scrape_games(game_ids, cache=FileCache(directory), combine=False)
+    print("Recorded {} games into {}, {} failed".format(len(games), directory, len(failures)))
+
+############################################# Timing ###################################################
+def time_stages(game_id, pbp_text, misc_text):
+    '''
+    time_stages - Function to run the pipeline one stage at a time on a single game
+    returns - ({stage: seconds}, number of raw events)
+    '''
+    times = {}
+
+    def timed(name, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        times[name] = time.perf_counter() - start
+        return result
+
+    pbp_json = timed('extract_json', scraper.extract_json, pbp_text)
+    # the old parse path, kept as a reference point
+    timed('json_normalize', pd.json_normalize, pbp_json)
+    pbp = timed('build_events', scraper.build_events, pbp_json)
+    pbp = timed('normalize_period_columns', scraper.normalize_period_columns, pbp)
+    pbp = timed('add_header_trailer', scraper.add_header_trailer, pbp)
+    with contextlib.redirect_stdout(io.StringIO()):
+        pbp = timed('add_misc_info', scraper.add_misc_info, pbp, game_id, misc_text)
+    for stage in scraper.CLEAN_STAGES:
+        pbp = timed(stage.__name__, stage, pbp)
+    return times, len(pbp_json)
+
+def bench_single(game_id, pbp_text, misc_text, repeat):
+    runs = [time_stages(game_id, pbp_text, misc_text)[0] for _ in range(repeat)]
+    stages = {name: statistics.median(run[name] for run in runs) * 1000 for name in runs[0]}
+    session = StubSession({game_id: (pbp_text, misc_text)})
+    walls = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            scraper.scrape_game(game_id, session=session)
+            walls.append(time.perf_counter() - start)
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        pbp = scraper.scrape_game(game_id, session=session)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'game_id': game_id,
+        'events': len(scraper.extract_json(pbp_text)),
+        'rows': len(pbp),
+        'wall_ms': statistics.median(walls) * 1000,
+        'stages_ms': stages,
+        'peak_mib': peak / 2**20,
+    }
+
+def bench_season(games, max_workers):
+    # per stage totals, one game at a time
+    totals = {}
+    events = 0
+    for game_id, (pbp_text, misc_text) in games.items():
+        times, n = time_stages(game_id, pbp_text, misc_text)
+        events += n
+        for name, seconds in times.items():
+            totals[name] = totals.get(name, 0) + seconds
+    # end to end through scrape_games, then again under tracemalloc for the peak
+    session = StubSession(games)
+    start = time.perf_counter()
+    frame, failures = scraper.scrape_games(list(games), max_workers=max_workers, session=session)
+    wall = time.perf_counter() - start
+    del frame
+    tracemalloc.start()
+    frame, _ = scraper.scrape_games(list(games), max_workers=max_workers, session=session)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'games': len(games),
+        'events': events,
+        'rows': len(frame),
+        'failures': len(failures),
+        'wall_s': wall,
+        'games_per_s': len(games) / wall if wall else None,
+        'stages_total_ms': {name: seconds * 1000 for name, seconds in totals.items()},
+        'peak_mib': peak / 2**20,
+    }
+
+def run(args):
+    sources = {}
+    if args.source in ('synthetic', 'both'):
+        sources['synthetic'] = synthetic_games(args.games, args.events_per_period)
+    if args.source in ('recorded', 'both'):
+        recorded = recorded_games(args.fixtures)
+        if recorded:
+            sources['recorded'] = recorded
+        else:
+            print("No recorded games in {}, skipping".format(args.fixtures), file=sys.stderr)
+    results = {'meta': meta(), 'results': {}}
+    for name, games in sources.items():
+        game_id = next(iter(games))
+        results['results'][name] = {
+            'single': bench_single(game_id, *games[game_id], repeat=args.repeat),
+            'season': bench_season(games, args.max_workers),
+        }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+
+def meta():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'pandas': pd.__version__,
+            'numpy': np.__version__, 'machine': platform.machine(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+############################################# Load #####################################################
+def bench_load(args):
+    '''
+    bench_load - Function to scrape a season end to end over real HTTP from a local mock server, with the
+                 latency, errors and throttling it's told to inject
+    returns - throughput, request latency percentiles, failures and what the client and server saw
+    '''
+    server = start_mock_server(games=args.games, fixtures=args.fixtures if args.source == 'recorded' else None,
+                               latency=args.latency, latency_sigma=args.latency_sigma, error_rate=args.error_rate,
+                               rate=args.server_rate, events_per_period=args.events_per_period)
+    fetches = []
+
+    def observer(metric, value, **labels):
+        if metric == 'fetch_seconds':
+            fetches.append(value)
+
+    client = transport.Transport(rate=args.client_rate or None, retries=args.retries)
+    transport.set_transport(client)
+    feeds.set_base_url(server.url)
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            frame, failures = scraper.scrape_games(range(1, args.games + 1), max_workers=args.max_workers, observer=observer)
+        wall = time.perf_counter() - start
+    finally:
+        feeds.set_base_url()
+        server.stop()
+    fetches = np.array(fetches) * 1000
+    percentiles = np.percentile(fetches, [50, 95, 99]) if len(fetches) else [None] * 3
+    return {
+        'games': args.games,
+        'rows': len(frame),
+        'failures': len(failures),
+        'wall_s': wall,
+        'games_per_s': args.games / wall if wall else None,
+        'fetch_p50_ms': percentiles[0],
+        'fetch_p95_ms': percentiles[1],
+        'fetch_p99_ms': percentiles[2],
+        'fetch_max_ms': fetches.max() if len(fetches) else None,
+        'client': dict(client.stats),
+        'server': server.snapshot(),
+    }
+
+def load(args):
+    results = {'meta': meta(), 'settings': {key: value for key, value in vars(args).items() if key != 'command'},
+               'results': {'load': bench_load(args)}}
+    text = json.dumps(results, indent=2, default=float)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+
+############################################# Compare ##################################################
+def compare(before_path, after_path):
+    # print every numeric metric in both files with the after/before ratio
+    with open(before_path) as f:
+        before = flatten(json.load(f)['results'])
+    with open(after_path) as f:
+        after = flatten(json.load(f)['results'])
+    width = max((len(key) for key in before), default=0)
+    for key in before:
+        if key in after and before[key]:
+            print("{:<{w}}  {:>12.3f}  {:>12.3f}  {:>6.2f}x".format(key, before[key], after[key], after[key] / before[key], w=width))
+
+def flatten(results, prefix=''):
+    out = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            out.update(flatten(value, prefix + key + '.'))
+        elif isinstance(value, (int, float)) and any(part.endswith(METRIC_SUFFIXES) for part in (prefix + key).split('.')):
+            out[prefix + key] = value
+    return out
+
+def parse_ids(text):
+    # "1-60" or "1,2,5"
+    if '-' in text:
+        first, last = text.split('-')
+        return list(range(int(first), int(last) + 1))
+    return [int(game_id) for game_id in text.split(',')]
+
+def main():
+    # the stubs answer instantly, rate limiting them would only time the token bucket
+    transport.set_transport(transport.Transport(rate=None))
+    parser = argparse.ArgumentParser(description="Benchmark the PWHL play-by-play pipeline offline")
+    sub = parser.add_subparsers(dest='command', required=True)
+    run_parser = sub.add_parser('run', help="time every stage for one game and a season-sized batch")
+    run_parser.add_argument('--games', type=int, default=200, help="synthetic games in the season batch")
+    run_parser.add_argument('--events-per-period', type=int, default=80)
+    run_parser.add_argument('--source', choices=['synthetic', 'recorded', 'both'], default='both')
+    run_parser.add_argument('--fixtures', default=FIXTURES)
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--max-workers', type=int, default=8)
+    run_parser.add_argument('--output', help="also write the json results here")
+    compare_parser = sub.add_parser('compare', help="compare two result files")
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    load_parser = sub.add_parser('load', help="scrape over HTTP from a local mock server with injected latency and errors")
+    load_parser.add_argument('--games', type=int, default=200)
+    load_parser.add_argument('--events-per-period', type=int, default=80)
+    load_parser.add_argument('--source', choices=['synthetic', 'recorded'], default='synthetic')
+    load_parser.add_argument('--fixtures', default=FIXTURES)
+    load_parser.add_argument('--latency', type=float, default=0.05, help="median server latency in seconds")
+    load_parser.add_argument('--latency-sigma', type=float, default=0.5, help="lognormal spread, for a long tail")
+    load_parser.add_argument('--error-rate', type=float, default=0.0)
+    load_parser.add_argument('--server-rate', type=float, help="server answers 429 past this many requests per second")
+    load_parser.add_argument('--client-rate', type=float, default=0, help="client side rate limit (0 for none)")
+    load_parser.add_argument('--retries', type=int, default=4)
+    load_parser.add_argument('--max-workers', type=int, default=8)
+    load_parser.add_argument('--output', help="also write the json results here")
+    record_parser = sub.add_parser('record', help="download real feeds into the fixtures directory")
+    record_parser.add_argument('game_ids', help="e.g. 1-60 or 1,2,5")
+    record_parser.add_argument('--fixtures', default=FIXTURES)
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    elif args.command == 'compare':
+        compare(args.before, args.after)
+    elif args.command == 'load':
+        load(args)
+    else:
+        record(parse_ids(args.game_ids), args.fixtures)
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,24 @@
 # pwhl_pbp_scraper/__init__.py
+import importlib
 
-from .scraper import scrape_game
+# name -> module it lives in. They're imported on first use so `import pwhl_pbp_scraper` (and the cli's --help)
+# doesn't load pandas, numpy and requests
+_EXPORTS = {
+    'scrape_game': 'scraper',
+    'scrape_games': 'scraper',
+    'scrape_games_with_players': 'players',
+    'FileCache': 'cache',
+    'SQLiteCache': 'cache',
+    'Transport': 'transport',
+    'set_transport': 'transport',
+    'set_base_url': 'feeds',
+    'sync_games': 'sync',
+    'stream_game': 'stream',
+}
 
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module('.' + _EXPORTS[name], __name__), name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
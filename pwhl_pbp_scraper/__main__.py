@@ -0,0 +1,5 @@
+# python -m pwhl_pbp_scraper, same as the pwhl-pbp command
+from .cli import main
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+######################################### cache.py ##################################################
+#                                                                                                      #
+#                         On-disk cache for the raw HockeyTech feed responses                          #
+#                                                                                                      #
+########################################################################################################
+import gzip
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+
+from .feeds import game_is_final
+from .files import atomic_write
+
+# a live play-by-play stored this recently is from the same scrape as the final summary, so it's final too
+PROMOTE_WINDOW = 60
+
+class FeedCache(ABC):
+    '''
+    FeedCache - Base class for raw feed caches, keyed by feed view and game_id
+    Entries for finished games never expire. Entries for games that were not final when they were
+    stored expire after ttl seconds, unless stale entries are asked for (offline mode)
+    Backends implement _read, _write, _promote and game_ids
+    '''
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        # one put at a time, so a play-by-play stored while its final summary is being stored can't miss it
+        self._put_lock = threading.Lock()
+
+    def __getstate__(self):
+        # locks don't pickle, a copy sent to another process gets its own
+        state = self.__dict__.copy()
+        del state['_put_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._put_lock = threading.Lock()
+
+    def get(self, view, game_id, stale_ok=False):
+        entry = self._read(view, game_id)
+        if entry is None:
+            return None
+        text, final, stored_at = entry
+        if final or stale_ok or time.time() - stored_at < self.ttl:
+            return text
+        return None
+
+    def put(self, view, game_id, text):
+        # the summary says whether the game is over, the play-by-play is final if it was downloaded
+        # after we already had a final summary for the game, or alongside it (both feeds are fetched together)
+        final = game_is_final(text) if view == 'gameSummary' else None
+        with self._put_lock:
+            if final is None:
+                final = self.is_final(game_id)
+            self._write(view, game_id, text, final)
+            if view == 'gameSummary' and final:
+                entry = self._read('gameCenterPlayByPlay', game_id)
+                if entry is not None and not entry[1] and time.time() - entry[2] <= PROMOTE_WINDOW:
+                    self._promote('gameCenterPlayByPlay', game_id)
+
+    def is_final(self, game_id):
+        entry = self._read('gameSummary', game_id)
+        return entry is not None and entry[1]
+
+    @abstractmethod
+    def game_ids(self, view):
+        # every game id with a stored entry for this view
+        pass
+
+    @abstractmethod
+    def _read(self, view, game_id):
+        # return (text, final, stored_at) or None
+        pass
+
+    @abstractmethod
+    def _write(self, view, game_id, text, final):
+        pass
+
+    @abstractmethod
+    def _promote(self, view, game_id):
+        # mark a live entry final, it never expires after that
+        pass
+
+
+class FileCache(FeedCache):
+    '''
+    FileCache - One gzip file per feed and game, laid out as directory/view/game_id.{final,live}.jsonp.gz
+    '''
+    def __init__(self, directory, ttl=300):
+        super().__init__(ttl)
+        self.directory = directory
+
+    def _path(self, view, game_id, final):
+        return os.path.join(self.directory, view, '{}.{}.jsonp.gz'.format(game_id, 'final' if final else 'live'))
+
+    def game_ids(self, view):
+        try:
+            names = os.listdir(os.path.join(self.directory, view))
+        except FileNotFoundError:
+            return []
+        return sorted({int(name.split('.')[0]) for name in names if name.endswith('.jsonp.gz')})
+
+    def _read(self, view, game_id):
+        for final in (True, False):
+            path = self._path(view, game_id, final)
+            try:
+                stored_at = os.path.getmtime(path)
+                with gzip.open(path, 'rt', encoding='utf-8') as f:
+                    return f.read(), final, stored_at
+            except FileNotFoundError:
+                continue
+        return None
+
+    def _write(self, view, game_id, text, final):
+        path = self._path(view, game_id, final)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # readers in other threads never see half a file
+        body = gzip.compress(text.encode('utf-8'))
+        atomic_write(path, lambda f: f.write(body), 'wb')
+        if final:
+            try:
+                os.remove(self._path(view, game_id, False))
+            except FileNotFoundError:
+                pass
+
+    def _promote(self, view, game_id):
+        try:
+            os.replace(self._path(view, game_id, False), self._path(view, game_id, True))
+        except FileNotFoundError:
+            pass
+
+
+class SQLiteCache(FeedCache):
+    '''
+    SQLiteCache - All feeds in a single SQLite file, bodies zlib compressed
+    '''
+    def __init__(self, path, ttl=300):
+        super().__init__(ttl)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS feeds (view TEXT, game_id TEXT, body BLOB, final INTEGER, stored_at REAL, "
+                "PRIMARY KEY (view, game_id))"
+            )
+
+    def game_ids(self, view):
+        with self._lock:
+            rows = self._conn.execute("SELECT game_id FROM feeds WHERE view = ?", (view,)).fetchall()
+        return sorted(int(row[0]) for row in rows)
+
+    def __getstate__(self):
+        # connections don't pickle, a copy sent to another process opens its own
+        return {'path': self.path, 'ttl': self.ttl}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['ttl'])
+
+    def _read(self, view, game_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, final, stored_at FROM feeds WHERE view = ? AND game_id = ?", (view, str(game_id))
+            ).fetchone()
+        if row is None:
+            return None
+        return zlib.decompress(row[0]).decode('utf-8'), bool(row[1]), row[2]
+
+    def _write(self, view, game_id, text, final):
+        body = zlib.compress(text.encode('utf-8'))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO feeds (view, game_id, body, final, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (view, str(game_id), body, int(final), time.time())
+            )
+
+    def _promote(self, view, game_id):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE feeds SET final = 1 WHERE view = ? AND game_id = ?", (view, str(game_id)))
+
+    def close(self):
+        self._conn.close()
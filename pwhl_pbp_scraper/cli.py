@@ -0,0 +1,197 @@
+######################################### cli.py ####################################################
+#                                                                                                      #
+#                   pwhl-pbp command line: backfill, sync and export (python -m pwhl_pbp_scraper)      #
+#                                                                                                      #
+#   pwhl-pbp backfill 1-5000 --store pwhl_pbp --cache pwhl_cache                                      #
+#   pwhl-pbp sync --manifest pwhl_manifest.json --store pwhl_pbp                                      #
+#   pwhl-pbp export --store pwhl_pbp --season 1 season1.csv                                           #
+#                                                                                                      #
+########################################################################################################
+# only the standard library up here, everything else is imported inside the command that needs it so
+# --help and a sync with nothing to do start fast
+import argparse
+import json
+import os
+import sys
+import time
+
+from .files import atomic_write
+
+def parse_ids(text):
+    # "1-60", "1,2,5" or a mix like "1-10,15"
+    game_ids = []
+    for part in text.split(','):
+        if '-' in part:
+            first, last = part.split('-')
+            game_ids.extend(range(int(first), int(last) + 1))
+        else:
+            game_ids.append(int(part))
+    return game_ids
+
+def load_checkpoint(path):
+    # {"done": [game_id, ...], "failed": {"<game_id>": "error"}}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'done': [], 'failed': {}}
+
+def save_checkpoint(checkpoint, path):
+    # killing the run mid-write can't lose the checkpoint
+    atomic_write(path, lambda f: json.dump(checkpoint, f))
+
+def format_seconds(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '{}h{:02d}m{:02d}s'.format(hours, minutes, seconds) if hours else '{}m{:02d}s'.format(minutes, seconds)
+
+class Progress:
+    '''
+    Progress - Prints games done, throughput and an ETA to stderr after every chunk
+    '''
+    def __init__(self, total, label):
+        self.total = total
+        self.label = label
+        self.done = 0
+        self.failed = 0
+        self.start = time.monotonic()
+
+    def update(self, done, failed):
+        self.done += done
+        self.failed += failed
+        elapsed = time.monotonic() - self.start
+        rate = self.done / elapsed if elapsed else 0
+        eta = format_seconds((self.total - self.done) / rate) if rate else '?'
+        print("{}: {}/{} games ({} failed), {:.1f} games/s, ETA {}".format(
+            self.label, self.done, self.total, self.failed, rate, eta), file=sys.stderr)
+
+def make_cache(args):
+    if args.cache is None:
+        return None
+    from .cache import FileCache, SQLiteCache
+    return SQLiteCache(args.cache) if args.cache.endswith('.db') else FileCache(args.cache)
+
+def make_observer(args):
+    # --metrics foo.prom writes the Prometheus text format when the command ends, anything else gets JSON lines
+    if args.metrics is None:
+        return None
+    from .metrics import JSONLinesSink, MetricsSink
+    return MetricsSink() if args.metrics.endswith('.prom') else JSONLinesSink(args.metrics)
+
+def finish_observer(observer, args):
+    if observer is None:
+        return
+    from .metrics import MetricsSink
+    if isinstance(observer, MetricsSink):
+        observer.write(args.metrics)
+    else:
+        observer.close()
+
+def backfill(args):
+    from .scraper import scrape_games
+    checkpoint = load_checkpoint(args.checkpoint)
+    skip = set(checkpoint['done'])
+    if not args.retry_failed:
+        skip.update(int(game_id) for game_id in checkpoint['failed'])
+    game_ids = [game_id for game_id in parse_ids(args.game_ids) if game_id not in skip]
+    if len(skip):
+        print("Resuming from {}, {} games already done".format(args.checkpoint, len(skip)), file=sys.stderr)
+    cache = make_cache(args)
+    # the parquet store needs the compact schema
+    compact = args.store is not None
+    progress = Progress(len(game_ids), 'backfill')
+    observer = make_observer(args)
+    from .metrics import MetricsSink
+    for i in range(0, len(game_ids), args.chunk_size):
+        chunk = game_ids[i:i + args.chunk_size]
+        games, failures = scrape_games(chunk, max_workers=args.workers, cache=cache, compact=compact, observer=observer)
+        if len(games):
+            if args.store is not None:
+                from .store import write_games
+                write_games(games, args.store)
+            if args.csv is not None:
+                games.to_csv(args.csv, mode='a', index=False, header=not os.path.exists(args.csv) or os.path.getsize(args.csv) == 0)
+        # only checkpoint once the chunk is written out
+        checkpoint['done'].extend(game_id for game_id in chunk if game_id not in failures)
+        for game_id, exc in failures.items():
+            checkpoint['failed'][str(game_id)] = repr(exc)
+        for game_id in chunk:
+            if game_id not in failures:
+                checkpoint['failed'].pop(str(game_id), None)
+        save_checkpoint(checkpoint, args.checkpoint)
+        progress.update(len(chunk), len(failures))
+        if isinstance(observer, MetricsSink):
+            # keep the .prom file current through a long run
+            observer.write(args.metrics)
+    finish_observer(observer, args)
+
+def sync(args):
+    from .sync import sync_games
+    start = time.monotonic()
+    observer = make_observer(args)
+    games, failures = sync_games(args.manifest, first_game_id=args.first_game_id, store_root=args.store,
+                                 cache=make_cache(args), max_workers=args.workers, stop_after=args.stop_after,
+                                 observer=observer)
+    finish_observer(observer, args)
+    print("sync: {} games updated, {} failed in {}".format(len(games), len(failures), format_seconds(time.monotonic() - start)),
+          file=sys.stderr)
+    for game_id, exc in failures.items():
+        print("  game {}: {!r}".format(game_id, exc), file=sys.stderr)
+
+def export(args):
+    from .store import read_games
+    game_ids = parse_ids(args.games) if args.games else None
+    pbp = read_games(args.store, season_id=args.season, game_ids=game_ids)
+    if args.output.endswith('.parquet'):
+        pbp.to_parquet(args.output, index=False)
+    else:
+        pbp.to_csv(args.output, index=False)
+    print("export: {} rows from {} games to {}".format(len(pbp), pbp['game_id'].nunique(), args.output), file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='pwhl-pbp', description="Scrape PWHL play-by-play data")
+    parser.add_argument('--rate', type=float, default=20, help="most requests per second (default 20, 0 for no limit)")
+    parser.add_argument('--retries', type=int, default=4, help="retries for failed requests (default 4)")
+    parser.add_argument('--base-url', help="feed server to use instead of the HockeyTech api, e.g. mock_server.py's")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    backfill_parser = sub.add_parser('backfill', help="scrape a range of games, resumable")
+    backfill_parser.add_argument('game_ids', help="e.g. 1-5000 or 1,2,5")
+    backfill_parser.add_argument('--store', help="parquet store to write the games to (needs pyarrow)")
+    backfill_parser.add_argument('--csv', help="csv file to append the games to")
+    backfill_parser.add_argument('--checkpoint', default='pwhl_backfill.json', help="progress file, rerun to resume")
+    backfill_parser.add_argument('--retry-failed', action='store_true', help="try games that failed last time again")
+    backfill_parser.add_argument('--cache', help="raw feed cache, a directory or a .db file")
+    backfill_parser.add_argument('--workers', type=int, default=8)
+    backfill_parser.add_argument('--chunk-size', type=int, default=50, help="games per checkpoint")
+    backfill_parser.add_argument('--metrics', help="write metrics here, .prom for Prometheus text, otherwise JSON lines")
+
+    sync_parser = sub.add_parser('sync', help="bring a season up to date, only new or changed games")
+    sync_parser.add_argument('--manifest', default='pwhl_manifest.json')
+    # required, the manifest marks games as synced so games cleaned without a store to go to would never be written
+    sync_parser.add_argument('--store', required=True, help="parquet store to write changed games to (needs pyarrow)")
+    sync_parser.add_argument('--cache', help="raw feed cache, a directory or a .db file")
+    sync_parser.add_argument('--first-game-id', type=int, default=1)
+    sync_parser.add_argument('--stop-after', type=int, default=3, help="missing games in a row that end the schedule")
+    sync_parser.add_argument('--workers', type=int, default=8)
+    sync_parser.add_argument('--metrics', help="write metrics here, .prom for Prometheus text, otherwise JSON lines")
+
+    export_parser = sub.add_parser('export', help="write games from the parquet store to csv or parquet")
+    export_parser.add_argument('output', help="file to write, .parquet or .csv")
+    export_parser.add_argument('--store', required=True)
+    export_parser.add_argument('--season', type=int)
+    export_parser.add_argument('--games', help="e.g. 1-40")
+
+    args = parser.parse_args(argv)
+    if args.command == 'backfill' and args.store is None and args.csv is None:
+        parser.error("backfill needs --store and/or --csv")
+    if args.command in ('backfill', 'sync'):
+        from .transport import Transport, set_transport
+        set_transport(Transport(rate=args.rate or None, retries=args.retries))
+        if args.base_url:
+            from .feeds import set_base_url
+            set_base_url(args.base_url)
+    {'backfill': backfill, 'sync': sync, 'export': export}[args.command](args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+######################################### feeds.py ##################################################
+#                                                                                                      #
+#            The HockeyTech feeds, downloading and decoding the raw JSONP (no pandas in here)          #
+#                                                                                                      #
+########################################################################################################
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+
+from .transport import Transport, get_transport
+
+############################################# Config ###################################################
+# where the feeds are served from, PWHL_BASE_URL or set_base_url point them somewhere else (e.g. mock_server.py)
+DEFAULT_BASE_URL = "https://lscluster.hockeytech.com"
+FEED_PATHS = {
+    'gameCenterPlayByPlay': "/feed/index.php?feed=statviewfeed&view=gameCenterPlayByPlay&game_id={}&key=694cfeed58c932ee&client_code=pwhl&lang=en&league_id=&callback=angular.callbacks._8",
+    'gameSummary': "/feed/index.php?feed=statviewfeed&view=gameSummary&game_id={}&key=694cfeed58c932ee&site_id=2&client_code=pwhl&lang=en&league_id=&callback=angular.callbacks._6",
+}
+# full urls, filled in by set_base_url
+FEED_URLS = {}
+# connections kept alive per session, one session per thread
+POOL_SIZE = 16
+
+_local = threading.local()
+
+def set_base_url(base_url=None):
+    '''
+    set_base_url - Function to send every feed request to another server, e.g. set_base_url("http://127.0.0.1:8000")
+    parameters - base_url - scheme and host (and port), None goes back to PWHL_BASE_URL or the real api
+    '''
+    base_url = (base_url or os.environ.get('PWHL_BASE_URL') or DEFAULT_BASE_URL).rstrip('/')
+    # updated in place, everything that imported FEED_URLS sees the change
+    FEED_URLS.update({view: base_url + path for view, path in FEED_PATHS.items()})
+    return base_url
+
+set_base_url()
+
+def get_session():
+    # reuse one pooled keep-alive session per thread instead of a fresh connection per request
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=len(FEED_URLS), pool_maxsize=POOL_SIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _local.session = session
+    return session
+
+def fetch_feed(view, game_id, session=None, cache=None, offline=False, observer=None):
+    '''
+    fetch_feed - Function to download the raw JSONP body of one HockeyTech feed
+    parameters - view - the feed view (gameCenterPlayByPlay or gameSummary), game_id - the game to fetch,
+                 session - requests session to use, defaults to this thread's pooled session, or a Transport
+                 to send through instead of the shared one (see transport.py),
+                 cache - optional FeedCache to read from and store into, offline - only read from the cache,
+                 observer - optional callback for metrics (see metrics.py)
+    '''
+    if cache is not None:
+        text = cache.get(view, game_id, stale_ok=offline)
+        if observer is not None:
+            observer('cache_hits' if text is not None else 'cache_misses', 1, view=view)
+        if text is not None:
+            return text
+    if offline:
+        raise LookupError("{} for game {} is not in the cache".format(view, game_id))
+    # timeouts, retries and rate limiting all happen in the transport
+    transport = get_transport()
+    if isinstance(session, Transport):
+        transport, session = session, session.session
+    if session is None:
+        session = get_session()
+    if observer is not None:
+        start = time.perf_counter()
+    req = transport.get(FEED_URLS[view].format(game_id), session)
+    if observer is not None:
+        observer('fetch_seconds', time.perf_counter() - start, view=view)
+    req.raise_for_status()
+    if observer is not None:
+        observer('bytes_downloaded', len(req.text.encode('utf-8')), view=view)
+    if cache is not None:
+        cache.put(view, game_id, req.text)
+    return req.text
+
+def game_is_final(misc_text):
+    # gameSummary marks finished games with final=1 and a Final/Final OT/Final SO status
+    details = extract_json(misc_text).get('details', {})
+    return str(details.get('final')) == '1' or str(details.get('status', '')).lower().startswith('final')
+
+def extract_json(pbp_text):
+    pattern = r'angular\.callbacks\._\d+\('
+    json_str = re.sub(pattern, '', pbp_text).rstrip(');')
+    pbp_json = json.loads(json_str)
+    return pbp_json
@@ -0,0 +1,28 @@
+######################################### files.py ##################################################
+#                                                                                                      #
+#                   Writing files so a reader or a killed run never sees half of one                   #
+#                                                                                                      #
+########################################################################################################
+# only the standard library, the cli imports this before it knows whether it needs pandas
+import os
+import threading
+
+def atomic_write(path, write, mode='w'):
+    '''
+    atomic_write - Function to write a file to a temp file next to it, then rename it over path. The rename is
+                   atomic, so path is always either the old file or the whole new one
+    parameters - path - file to write, write - function(f) that writes the contents to the open temp file,
+                 mode - 'w' for text, 'wb' for bytes
+    '''
+    # one temp file per thread, so two threads writing the same path don't write into each other's
+    tmp_path = '{}.{}.tmp'.format(path, threading.get_ident())
+    try:
+        with open(tmp_path, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
@@ -0,0 +1,82 @@
+######################################### metrics.py ################################################
+#                                                                                                      #
+#                 Observers for the pipeline's metrics, Prometheus text format or JSON lines           #
+#                                                                                                      #
+########################################################################################################
+# An observer is any callable observer(metric, value, **labels). Pass one as observer= to scrape_game,
+# scrape_games, sync_games, build_game or clean_pbp and it's called with:
+#   stage_seconds, stage_rows  (stage=)  every parse and clean_pbp stage, plus add_misc_info
+#   fetch_seconds, bytes_downloaded, cache_hits, cache_misses  (view=)  every feed request
+#   failures  (stage=, error=)  anything that made a game fail or lose its team info
+#   games  games finished
+import json
+import threading
+import time
+
+from .files import atomic_write
+
+# metrics that are plain running totals, everything else is reported as a summary (sum and count)
+COUNTERS = {'bytes_downloaded', 'cache_hits', 'cache_misses', 'failures', 'games'}
+
+class MetricsSink:
+    '''
+    MetricsSink - Observer that keeps a running sum and count per metric and label set, and writes them out in
+    the Prometheus text format (e.g. for node_exporter's textfile collector)
+    '''
+    def __init__(self, prefix='pwhl'):
+        self.prefix = prefix
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, metric, value, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            total = self.values.setdefault(key, [0, 0])
+            total[0] += value
+            total[1] += 1
+
+    def prometheus(self):
+        lines = []
+        with self._lock:
+            values = sorted(self.values.items())
+        typed = set()
+        for (metric, labels), (total, count) in values:
+            name = '{}_{}'.format(self.prefix, metric)
+            label_text = '{' + ','.join('{}="{}"'.format(k, str(v).replace('"', '\\"')) for k, v in labels) + '}' if labels else ''
+            if metric in COUNTERS:
+                if name not in typed:
+                    lines.append('# TYPE {}_total counter'.format(name))
+                    typed.add(name)
+                lines.append('{}_total{} {}'.format(name, label_text, total))
+            else:
+                if name not in typed:
+                    lines.append('# TYPE {} summary'.format(name))
+                    typed.add(name)
+                lines.append('{}_sum{} {}'.format(name, label_text, total))
+                lines.append('{}_count{} {}'.format(name, label_text, count))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        # scrapers reading the file never see half of it
+        text = self.prometheus()
+        atomic_write(path, lambda f: f.write(text))
+
+
+class JSONLinesSink:
+    '''
+    JSONLinesSink - Observer that appends every observation to a file as one JSON object per line
+    {"time": ..., "metric": ..., "value": ..., <labels>}
+    '''
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a')
+        self._lock = threading.Lock()
+
+    def __call__(self, metric, value, **labels):
+        line = json.dumps(dict(labels, time=time.time(), metric=metric, value=value))
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def close(self):
+        with self._lock:
+            self._file.close()
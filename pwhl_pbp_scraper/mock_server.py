@@ -0,0 +1,188 @@
+######################################### mock_server.py ############################################
+#                                                                                                      #
+#         Local stand-in for the HockeyTech feeds, for load testing without touching the real api      #
+#                                                                                                      #
+#   python -m pwhl_pbp_scraper.mock_server --games 200 --latency 0.05 --error-rate 0.02 --rate 50      #
+#   pwhl-pbp --base-url http://127.0.0.1:8000 backfill 1-200 --csv games.csv                           #
+#                                                                                                      #
+########################################################################################################
+# only the standard library, so the server itself never competes with the scraper for pandas time
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from . import synthetic
+from .cache import FileCache
+from .transport import TokenBucket
+
+FEED_PATH = '/feed/index.php'
+# what an injected error answers with, picked at random
+ERROR_STATUSES = [500, 502, 503]
+# bodies for a game the server doesn't have, the same as the api gives for a game that doesn't exist yet
+MISSING_BODIES = {'gameCenterPlayByPlay': [], 'gameSummary': {}}
+
+class MockHandler(BaseHTTPRequestHandler):
+    '''
+    MockHandler - Answers GET /feed/index.php?view=...&game_id=...&callback=... like the api, and GET /stats
+    with what the server has done so far
+    '''
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        if url.path == '/stats':
+            return self.send_body(200, json.dumps(server.snapshot()), 'application/json')
+        query = parse_qs(url.query)
+        view = query.get('view', [None])[0]
+        if url.path != FEED_PATH or view not in MISSING_BODIES or not query.get('game_id', [''])[0].isdigit():
+            return self.send_body(404, 'Not found')
+        # throttled requests are turned away straight away, like a real rate limiter
+        if server.bucket is not None:
+            wait = server.bucket.try_acquire()
+            if wait:
+                return self.send_body(429, 'Too many requests', headers={'Retry-After': str(max(1, math.ceil(wait)))})
+        latency = server.latency_for()
+        if latency:
+            time.sleep(latency)
+        if server.error_rate and random.random() < server.error_rate:
+            return self.send_body(random.choice(ERROR_STATUSES), 'Injected error')
+        callback = query.get('callback', ['angular.callbacks._8'])[0]
+        self.send_body(200, server.feed(view, int(query['game_id'][0]), callback), 'application/javascript')
+
+    def send_body(self, status, text, content_type='text/plain', headers=None):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type + '; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        if not self.path.startswith('/stats'):
+            self.server.count(status, len(body))
+
+    def log_message(self, format, *args):
+        # one line per request would drown out everything under load
+        pass
+
+
+class MockServer(ThreadingHTTPServer):
+    '''
+    MockServer - Threaded HTTP server that replays recorded feeds and makes up the rest
+    parameters - address - (host, port), port 0 picks a free one, games - synthetic games 1..games exist,
+                 fixtures - FileCache directory of recorded feeds (benchmarks/run.py record), served first,
+                 latency - median seconds added to each response, latency_sigma - spread of a lognormal around
+                 that for a long tail (0 for a fixed delay), error_rate - fraction answered with a 5xx,
+                 rate/burst - answer 429 with Retry-After past rate requests per second (None for no limit),
+                 events_per_period - size of the synthetic games
+    '''
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 8000), games=200, fixtures=None, latency=0.0, latency_sigma=0.0,
+                 error_rate=0.0, rate=None, burst=None, events_per_period=80):
+        super().__init__(address, MockHandler)
+        self.games = games
+        self.fixtures = FileCache(fixtures) if fixtures else None
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.bucket = TokenBucket(rate, burst or rate) if rate else None
+        self.events_per_period = events_per_period
+        self.stats = {'requests': 0, 'bytes_sent': 0, 'statuses': {}}
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._synthetic = lru_cache(maxsize=None)(self._make_game)
+
+    @property
+    def url(self):
+        # base url to hand to set_base_url or --base-url
+        host, port = self.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def latency_for(self):
+        if not self.latency:
+            return 0
+        if not self.latency_sigma:
+            return self.latency
+        return random.lognormvariate(math.log(self.latency), self.latency_sigma)
+
+    def feed(self, view, game_id, callback):
+        if self.fixtures is not None:
+            text = self.fixtures.get(view, game_id, stale_ok=True)
+            if text is not None:
+                return text
+        if 1 <= game_id <= self.games:
+            pbp_text, misc_text = self._synthetic(game_id)
+            text = pbp_text if view == 'gameCenterPlayByPlay' else misc_text
+            # same body, under the callback that was asked for
+            return callback + text[text.index('('):]
+        return synthetic.to_jsonp(MISSING_BODIES[view], callback)
+
+    def _make_game(self, game_id):
+        return synthetic.game_feeds(game_id, self.events_per_period)
+
+    def count(self, status, size):
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['bytes_sent'] += size
+            self.stats['statuses'][str(status)] = self.stats['statuses'].get(str(status), 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = json.loads(json.dumps(self.stats))
+        elapsed = time.monotonic() - self.started
+        stats['seconds'] = elapsed
+        stats['requests_per_s'] = stats['requests'] / elapsed if elapsed else 0
+        return stats
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def start_mock_server(port=0, host='127.0.0.1', **options):
+    '''
+    start_mock_server - Function to run a MockServer on a background thread, e.g. for a load test in one script
+    parameters - port - 0 picks a free one, options - see MockServer
+    returns - the server, point the scraper at it with set_base_url(server.url) and call server.stop() after
+    '''
+    server = MockServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pwhl_pbp_scraper.mock_server',
+                                     description="Serve recorded or synthetic HockeyTech feeds locally")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--games', type=int, default=200, help="synthetic games 1..N exist (default 200)")
+    parser.add_argument('--fixtures', help="FileCache directory of recorded feeds to serve first")
+    parser.add_argument('--events-per-period', type=int, default=80)
+    parser.add_argument('--latency', type=float, default=0.0, help="median seconds added to each response")
+    parser.add_argument('--latency-sigma', type=float, default=0.0, help="lognormal spread of the latency, 0 for fixed")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with a 5xx")
+    parser.add_argument('--rate', type=float, help="requests per second before answering 429")
+    parser.add_argument('--burst', type=int, help="requests allowed at once over the rate (default the rate)")
+    args = parser.parse_args(argv)
+    server = MockServer((args.host, args.port), games=args.games, fixtures=args.fixtures, latency=args.latency,
+                        latency_sigma=args.latency_sigma, error_rate=args.error_rate, rate=args.rate, burst=args.burst,
+                        events_per_period=args.events_per_period)
+    print("Serving feeds on {}, stats at {}/stats".format(server.url, server.url), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.snapshot(), indent=1), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+######################################### parallel.py ###############################################
+#                                                                                                      #
+#          Rebuilding cached games across a process pool, results come back as Arrow IPC buffers       #
+#                                                                                                      #
+########################################################################################################
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .scraper import combine_games, compact_dtypes, fetch_feed, parse_game
+from .store import pa, require_pyarrow
+
+def rebuild_games(game_ids, cache, processes=None, chunk_size=None):
+    '''
+    rebuild_games - Function to rebuild games from a FeedCache on every core. Each worker reads its own games
+                    from the cache, cleans them in one clean_games pass and sends back the compact frame as an
+                    Arrow IPC buffer, so the parent only stitches column buffers together instead of unpickling
+                    object columns. Needs pyarrow and gives the compact schema (see compact_pbp)
+    parameters - game_ids - games to rebuild, in the order they should come back, cache - FileCache or SQLiteCache
+                 holding both feeds of every game, processes - worker processes (defaults to every core),
+                 chunk_size - games per task, defaults to about two tasks per worker
+    returns - (games, failures), the same as scrape_games(game_ids, cache=cache, offline=True, compact=True)
+    '''
+    require_pyarrow()
+    game_ids = list(game_ids)
+    processes = processes or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(len(game_ids) / (processes * 2)))
+    chunks = [game_ids[i:i + chunk_size] for i in range(0, len(game_ids), chunk_size)]
+    tables = []
+    failures = {}
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        # map keeps the chunks in order whatever order they finish in
+        for buffer, chunk_failures in pool.map(build_chunk, [cache] * len(chunks), chunks):
+            failures.update(chunk_failures)
+            if buffer is not None:
+                tables.append(pa.ipc.open_stream(buffer).read_all())
+    if not tables:
+        return pd.DataFrame(), failures
+    games = compact_dtypes(pa.concat_tables(tables).to_pandas())
+    # arrow merges each chunk's categories in the order it sees them, sort them so the result doesn't depend on chunking
+    for col in games.select_dtypes('category').columns:
+        games[col] = games[col].cat.reorder_categories(sorted(games[col].cat.categories))
+    return games, failures
+
+def build_chunk(cache, game_ids):
+    # runs in a worker, returns (Arrow IPC stream bytes or None, failures)
+    raw = {}
+    failures = {}
+    for game_id in game_ids:
+        try:
+            pbp_text = fetch_feed('gameCenterPlayByPlay', game_id, cache=cache, offline=True)
+            misc_text = fetch_feed('gameSummary', game_id, cache=cache, offline=True)
+            raw[game_id] = parse_game(game_id, pbp_text, misc_text)
+        except Exception as exc:
+            failures[game_id] = exc
+    games, clean_failures = combine_games(raw, compact=True)
+    failures.update(clean_failures)
+    if len(games) == 0:
+        return None, failures
+    table = pa.Table.from_pandas(games, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue(), failures
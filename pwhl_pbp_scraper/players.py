@@ -0,0 +1,125 @@
+######################################### players.py ################################################
+#                                                                                                      #
+#           Player dimension table, so event frames can carry player ids and join names on demand      #
+#                                                                                                      #
+########################################################################################################
+import pandas as pd
+
+from .scraper import (COMPACT_COLUMNS, COMPACT_DTYPES, DETAIL_FIELDS, OUTPUT_COLUMNS, PLAYER_FIELDS, compact_dtypes,
+                      extract_json, scrape_batch)
+
+# details objects in the play-by-play that hold a player, plus the assists list
+PLAYER_OBJECTS = [key for key, fields in DETAIL_FIELDS.items() if fields is PLAYER_FIELDS] + ['goalie', 'servedBy']
+PLAYER_TABLE_COLUMNS = ['game_id', 'player_id', 'team_id', 'name', 'first_name', 'last_name', 'position', 'sweater_number']
+ROLES = ['primary', 'secondary', 'tertiary']
+# what strip_players takes off the event frame and join_players puts back, the ids stay
+PLAYER_DETAIL_COLUMNS = {'name': 'name', 'position': 'position', 'sweater_number': 'sweater_number'}
+
+def scrape_games_with_players(game_ids, **options):
+    '''
+    scrape_games_with_players - Function to scrape games like scrape_games and build the player table of every game
+                                from the same responses, so it makes no extra requests
+    parameters - game_ids, options - see scrape_games
+    returns - (games, failures, players), players is the game_players tables of the games that didn't fail
+    '''
+    games, failures, tables = scrape_batch(game_ids, per_game=game_players, **options)
+    return games, failures, concat_players(list(tables.values()))
+
+def game_players(game_id, pbp_text, misc_text):
+    '''
+    game_players - Function to build one game's player table from both rosters in gameSummary and every player
+                   object in the play-by-play (for anyone missing from the rosters), one row per player
+    parameters - game_id - the game, pbp_text/misc_text - the raw gameCenterPlayByPlay and gameSummary feeds
+    '''
+    players = {}
+
+    def add(info, team_id=None):
+        if not isinstance(info, dict) or info.get('id') in (None, ''):
+            return
+        player_id = int(info['id'])
+        if player_id in players:
+            return
+        first, last = info.get('firstName'), info.get('lastName')
+        players[player_id] = (int(game_id), player_id, team_id, '{} {}'.format(first, last), first, last,
+                              info.get('position'), info.get('jerseyNumber'))
+
+    # rosters first, they know the team
+    misc_json = extract_json(misc_text)
+    for side in ('homeTeam', 'visitingTeam'):
+        team = misc_json.get(side) or {}
+        team_id = (team.get('info') or {}).get('id')
+        for group in ('skaters', 'goalies'):
+            for player in team.get(group) or []:
+                add(player.get('info') if isinstance(player, dict) else None, team_id)
+    for play in extract_json(pbp_text):
+        details = play.get('details')
+        if not isinstance(details, dict):
+            continue
+        for key in PLAYER_OBJECTS:
+            add(details.get(key))
+        for assist in details.get('assists') or []:
+            add(assist)
+    table = pd.DataFrame(list(players.values()), columns=PLAYER_TABLE_COLUMNS)
+    return player_dtypes(table)
+
+def season_players(players):
+    '''
+    season_players - Function to collapse per-game player tables into one row per player,
+                     taking each player's details from the latest game they were in
+    parameters - players - game_players tables concatenated, e.g. from scrape_games_with_players
+    '''
+    players = players.sort_values(['game_id', 'player_id'], kind='stable')
+    games = players.groupby('player_id').agg(first_game_id=('game_id', 'min'), last_game_id=('game_id', 'max'), games=('game_id', 'nunique'))
+    latest = players.drop_duplicates('player_id', keep='last').drop(columns='game_id').set_index('player_id')
+    return latest.join(games).reset_index()
+
+def concat_players(tables):
+    # per-game player tables in one frame, an empty one with the usual columns if there aren't any
+    if not tables:
+        return player_dtypes(pd.DataFrame(columns=PLAYER_TABLE_COLUMNS))
+    return pd.concat(tables, ignore_index=True)
+
+def player_dtypes(table):
+    for col, dtype in (('game_id', 'Int32'), ('player_id', 'Int32'), ('team_id', 'Int16'), ('sweater_number', 'Int16')):
+        table[col] = pd.to_numeric(table[col], errors='coerce').astype(dtype)
+    table['position'] = table['position'].astype('category')
+    return table
+
+def strip_players(pbp):
+    '''
+    strip_players - Function to drop the player names, positions and sweater numbers from a scraped frame and
+                    keep only the player ids, join_players puts them back
+    '''
+    return pbp.drop(columns=['event_{}_player_{}'.format(role, field) for role in ROLES for field in PLAYER_DETAIL_COLUMNS
+                             if 'event_{}_player_{}'.format(role, field) in pbp.columns])
+
+def join_players(pbp, players):
+    '''
+    join_players - Function to add player names, positions and sweater numbers to a frame of player ids
+    parameters - pbp - scraped games (stripped or not), players - per-game player tables (matched on
+                 game and player, so sweater numbers are the ones from that game) or a season_players table
+                 (matched on player only)
+    '''
+    per_game = 'game_id' in players.columns
+    keys = ['game_id', 'player_id'] if per_game else ['player_id']
+    lookup = players.drop_duplicates(keys, keep='last').set_index(keys)
+    # a compact frame (compact_pbp) keeps its player ids as Int32
+    compact = pbp['event_primary_player_id'].dtype == COMPACT_DTYPES['event_primary_player_id']
+    pbp = pbp.copy()
+    for role in ROLES:
+        ids = pd.to_numeric(pbp['event_{}_player_id'.format(role)], errors='coerce').astype('Int32')
+        if per_game:
+            rows = pd.MultiIndex.from_arrays([pd.to_numeric(pbp['game_id'], errors='coerce').astype('Int32'), ids])
+        else:
+            rows = pd.Index(ids)
+        found = lookup.reindex(rows)
+        for field, source in PLAYER_DETAIL_COLUMNS.items():
+            pbp['event_{}_player_{}'.format(role, field)] = found[source].to_numpy()
+    if compact:
+        # the joined columns come back as object, give them the compact schema's categories and small ints
+        pbp = compact_dtypes(pbp)
+    # back in the usual column order
+    for schema in (COMPACT_COLUMNS, OUTPUT_COLUMNS):
+        if set(schema) <= set(pbp.columns):
+            return pbp[schema + [col for col in pbp.columns if col not in schema]]
+    return pbp
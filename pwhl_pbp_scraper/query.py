@@ -0,0 +1,165 @@
+######################################### query.py ##################################################
+#                                                                                                      #
+#            Season index, posting lists of row offsets per player, team, event, period and flag       #
+#                                                                                                      #
+########################################################################################################
+import numpy as np
+import pandas as pd
+
+from .scraper import FLAG_VALUES
+
+# field you query by -> (kind of key, columns it comes from). player matches any of the three roles
+INDEX_FIELDS = {
+    'player': ('int', ['event_primary_player_id', 'event_secondary_player_id', 'event_tertiary_player_id']),
+    'primary_player': ('int', ['event_primary_player_id']),
+    'secondary_player': ('int', ['event_secondary_player_id']),
+    'tertiary_player': ('int', ['event_tertiary_player_id']),
+    'team': ('str', ['event_team']),
+    'event': ('str', ['event']),
+    'period': ('int', ['period']),
+    'game': ('int', ['game_id']),
+    # the feed only sends these three on goals, every other event has neither posting
+    'power_play': ('flag', ['is_power_play']),
+    'short_handed': ('flag', ['is_short_handed']),
+    'empty_net': ('flag', ['is_on_empty_net']),
+}
+
+class SeasonIndex:
+    '''
+    SeasonIndex - Posting lists over a season frame (scrape_games or read_games output, either schema): for every
+    field in INDEX_FIELDS the sorted row offsets of each value, so a filter is a couple of binary searches and
+    an intersection instead of a scan of the frame. Row offsets are positions (iloc) in the frame it was built
+    from, append more games to the end of that frame and to the index together
+    '''
+    def __init__(self):
+        self.n_rows = 0
+        # field -> (sorted keys, indptr, rows), rows of keys[i] are rows[indptr[i]:indptr[i + 1]]
+        self.postings = {}
+
+    def append(self, pbp):
+        '''
+        append - Function to index rows added to the end of the season frame. Only the new rows are read and sorted,
+                 their posting lists are then merged into the existing ones
+        '''
+        offsets = np.arange(self.n_rows, self.n_rows + len(pbp))
+        for field, (kind, cols) in INDEX_FIELDS.items():
+            keys, rows = [], []
+            for col in cols:
+                if col not in pbp.columns:
+                    continue
+                values, found = index_keys(pbp[col], kind)
+                keys.append(values)
+                rows.append(offsets[found])
+            if not keys:
+                continue
+            postings = make_postings(np.concatenate(keys), np.concatenate(rows))
+            if field in self.postings:
+                postings = merge_postings(self.postings[field], postings)
+            self.postings[field] = postings
+        self.n_rows += len(pbp)
+        return self
+
+    def lookup(self, field, value):
+        # sorted rows where field == value
+        keys, indptr, rows = self.postings[field]
+        kind = INDEX_FIELDS[field][0]
+        value = str(value) if kind == 'str' else int(bool(value)) if kind == 'flag' else int(value)
+        i = np.searchsorted(keys, value)
+        if i == len(keys) or keys[i] != value:
+            return rows[:0]
+        return rows[indptr[i]:indptr[i + 1]]
+
+    def rows(self, **filters):
+        '''
+        rows - Function to find the rows matching every filter, e.g. rows(player=123, event='shot', period=3)
+               A list of values matches any of them, e.g. event=['shot', 'goal']
+        returns - sorted row offsets
+        '''
+        result = None
+        for field, value in filters.items():
+            if field not in self.postings:
+                raise KeyError("{} isn't indexed, fields are {}".format(field, sorted(self.postings)))
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            matched = [self.lookup(field, v) for v in values]
+            matched = matched[0] if len(matched) == 1 else np.unique(np.concatenate(matched))
+            result = matched if result is None else np.intersect1d(result, matched, assume_unique=True)
+            if len(result) == 0:
+                break
+        return np.arange(self.n_rows) if result is None else result
+
+    def query(self, pbp, **filters):
+        # the matching rows of the season frame the index was built from
+        return pbp.iloc[self.rows(**filters)]
+
+    def save(self, path):
+        arrays = {'n_rows': np.array(self.n_rows)}
+        for field, (keys, indptr, rows) in self.postings.items():
+            arrays[field + '.keys'] = keys
+            arrays[field + '.indptr'] = indptr
+            arrays[field + '.rows'] = rows
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with np.load(path) as arrays:
+            index.n_rows = int(arrays['n_rows'])
+            for field in INDEX_FIELDS:
+                if field + '.keys' in arrays:
+                    index.postings[field] = (arrays[field + '.keys'], arrays[field + '.indptr'], arrays[field + '.rows'])
+        return index
+
+
+def build_index(pbp):
+    return SeasonIndex().append(pbp)
+
+def index_keys(col, kind):
+    # a column's values as index keys, and which rows have one
+    if kind == 'flag':
+        # 1 and 0 both get a posting list, rows without the flag at all get neither
+        values = col.astype(object).map(FLAG_VALUES).to_numpy()
+        found = pd.notna(values)
+        return values[found].astype(np.int64), found
+    if kind == 'int':
+        values = pd.to_numeric(col, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        found = ~np.isnan(values)
+        return values[found].astype(np.int64), found
+    values = col.astype(object).to_numpy()
+    found = pd.notna(values)
+    return values[found].astype(str), found
+
+def make_postings(keys, rows):
+    # (key, row) pairs -> sorted unique keys, indptr and rows grouped by key in row order, duplicates dropped
+    order = np.lexsort((rows, keys))
+    keys, rows = keys[order], rows[order]
+    keep = np.r_[True, (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])] if len(keys) else np.ones(0, dtype=bool)
+    keys, rows = keys[keep], rows[keep]
+    unique, starts = np.unique(keys, return_index=True)
+    return unique, np.r_[starts, len(keys)].astype(np.int64), rows.astype(row_dtype(rows))
+
+def merge_postings(old, new):
+    '''
+    merge_postings - Function to merge the posting lists of newly appended rows into the existing ones. Every new
+                     row comes after every old one, so each key's old rows then its new rows stay sorted, and the
+                     merge is one linear copy with no sorting
+    parameters - old, new - (keys, indptr, rows) from make_postings
+    '''
+    old_keys, old_indptr, old_rows = old
+    new_keys, new_indptr, new_rows = new
+    keys = np.union1d(old_keys, new_keys)
+    old_at = np.searchsorted(keys, old_keys)
+    new_at = np.searchsorted(keys, new_keys)
+    old_counts = np.zeros(len(keys), dtype=np.int64)
+    old_counts[old_at] = np.diff(old_indptr)
+    counts = old_counts.copy()
+    counts[new_at] += np.diff(new_indptr)
+    indptr = np.r_[0, np.cumsum(counts)].astype(np.int64)
+    rows = np.empty(indptr[-1], dtype=row_dtype(new_rows if len(new_rows) else old_rows))
+    # where each row lands, its key's new start plus its place within the key's old (or new) run
+    rows[np.repeat(indptr[:-1][old_at] - old_indptr[:-1], np.diff(old_indptr)) + np.arange(len(old_rows))] = old_rows
+    rows[np.repeat(indptr[:-1][new_at] + old_counts[new_at] - new_indptr[:-1], np.diff(new_indptr)) + np.arange(len(new_rows))] = new_rows
+    return keys, indptr, rows
+
+def row_dtype(rows):
+    # row offsets fit in int32 up to 2 billion rows
+    return np.int32 if not len(rows) or rows.max() < 2**31 else np.int64
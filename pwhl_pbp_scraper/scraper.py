@@ -15,10 +15,121 @@
 import pandas as pd
 import requests
 import numpy as np
-import json
-import re
+import string
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# the feed urls, requests and the raw JSONP live in feeds.py so they can be used without loading pandas
+from .feeds import FEED_URLS, POOL_SIZE, get_session, fetch_feed, game_is_final, extract_json
 
 ############################################# Config ###################################################
+# fields of the feed's details object that the cleaning stages read, the rest of the feed is never loaded
+# None is a plain value, a list is a nested object and the keys we want out of it
+PLAYER_FIELDS = ['id', 'firstName', 'lastName', 'jerseyNumber', 'position']
+DETAIL_FIELDS = {
+    'time': None, 'homeWin': None, 'isGoal': None, 'isGameWinningGoal': None, 'shotType': None, 'shotQuality': None,
+    'shooterTeamId': None, 'teamId': None, 'team_id': None, 'minutes': None, 'description': None,
+    'xLocation': None, 'yLocation': None,
+    'period': ['id'], 'team': ['id'], 'againstTeam': ['id'], 'shooter_team': ['id'], 'shooterTeam': ['id'],
+    'properties': ['isPowerPlay', 'isShortHanded', 'isEmptyNet', 'isPenaltyShot', 'isGameWinningGoal'],
+    'shooter': PLAYER_FIELDS, 'blocker': PLAYER_FIELDS, 'player': PLAYER_FIELDS, 'homePlayer': PLAYER_FIELDS,
+    'visitingPlayer': PLAYER_FIELDS, 'goalieComingIn': PLAYER_FIELDS, 'goalieGoingOut': PLAYER_FIELDS,
+    'takenBy': PLAYER_FIELDS, 'scoredBy': PLAYER_FIELDS, 'goalie': ['id', 'firstName', 'lastName', 'jerseyNumber'],
+}
+# first two assists get flattened into assistor_1_* and assistor_2_*
+MAX_ASSISTS = 2
+
+# who the event players are for each event type, applied in order so later rows win like the old .loc chain
+# (events, conditions, role, source prefix, quirks) - conditions are (column, 'isna'/'notna') or (column, '==', value)
+PLAYER_RULES = [
+    (('shot', 'blocked_shot', 'shootout', 'penaltyshot'), [], 'primary', 'details.shooter.', {}),
+    (('faceoff',), [('details.homeWin', '==', '1')], 'primary', 'details.homePlayer.', {}),
+    (('faceoff',), [('details.homeWin', '==', '1')], 'secondary', 'details.visitingPlayer.', {}),
+    (('faceoff',), [('details.homeWin', '==', '0')], 'primary', 'details.visitingPlayer.', {}),
+    (('faceoff',), [('details.homeWin', '==', '0')], 'secondary', 'details.homePlayer.', {}),
+    (('goalie_change',), [], 'primary', 'details.goalieComingIn.', {}),
+    (('goalie_change',), [('details.goalieComingIn.id', 'notna')], 'secondary', 'details.goalieGoingOut.', {}),
+    (('goalie_change',), [('details.goalieComingIn.id', 'isna')], 'primary', 'details.goalieGoingOut.', {}),
+    (('penalty',), [], 'primary', 'details.takenBy.', {}),
+    (('hit',), [], 'primary', 'details.player.', {}),
+    # blocked shot names have always been the blocker's and the shooter's first names, kept so the output doesn't change
+    (('blocked_shot',), [], 'secondary', 'details.blocker.', {'name': ('details.blocker.firstName', 'details.shooter.firstName')}),
+    (('goal',), [], 'primary', 'details.scoredBy.', {}),
+    # first assist sweater numbers have always come through as they are in the feed
+    (('goal',), [], 'secondary', 'assistor_1_', {'raw_sweater_number': True}),
+    (('goal',), [], 'tertiary', 'assistor_2_', {}),
+]
+
+# which feed column holds the event team id for each event type, later rows win
+TEAM_RULES = [
+    (('goal',), [], 'details.team.id'),
+    (('shot', 'blocked_shot', 'shootout_shot', 'shootout_goal'), [], 'details.shooterTeamId'),
+    (('faceoff',), [('details.homeWin', '==', '1')], 'home_team_id'),
+    (('faceoff',), [('details.homeWin', '==', '0')], 'away_team_id'),
+    (('hit',), [], 'details.teamId'),
+    (('penalty',), [], 'details.againstTeam.id'),
+    (('penalty_shot_shot', 'penalty_shot_goal'), [], 'details.shooter_team.id'),
+    (('goalie_entrance', 'goalie_pull', 'goalie_sub'), [], 'details.team_id'),
+    (('shootout_shot', 'shootout_goal'), [], 'details.shooterTeam.id'),
+]
+
+# description templates, {column} is filled from the row and the whole description is NaN if any part is missing
+DESC_RULES = [
+    (('goal',), [('event_secondary_player_id', 'isna')], "{event_team} goal scored by {event_primary_player_name}, unassisted"),
+    (('goal',), [('event_secondary_player_id', 'notna'), ('event_tertiary_player_id', 'isna')], "{event_team} goal scored by {event_primary_player_name}, assisted by {event_secondary_player_name}"),
+    (('goal',), [('event_secondary_player_id', 'notna'), ('event_tertiary_player_id', 'notna')], "{event_team} goal scored by {event_primary_player_name}, assisted by {event_secondary_player_name} and {event_tertiary_player_name}"),
+    (('shot',), [], "{event_team} shot by {event_primary_player_name}"),
+    (('blocked_shot',), [], "{event_team} blocked shot, shot by {event_primary_player_name}, blocked by  {event_secondary_player_name}"),
+    (('faceoff',), [('details.homeWin', '==', '0')], "{event_team} faceoff won by {event_primary_player_name}, lost by {home_team} {event_secondary_player_name}"),
+    (('faceoff',), [('details.homeWin', '==', '1')], "{event_team} faceoff won by {event_primary_player_name}, lost by {away_team} {event_secondary_player_name}"),
+    (('hit',), [], "{event_team} hit thrown by {event_primary_player_name}"),
+    (('goalie_sub',), [], "{event_team} goalie substitution, {event_primary_player_name} entering the game for {event_secondary_player_name}"),
+    (('goalie_pull',), [], "{event_team} goalie pull,  {event_primary_player_name} being pulled from the game"),
+    (('goalie_entrance',), [], "{event_team} goalie entrance, {event_primary_player_name} entering the game"),
+    (('penalty',), [], "{event_team} penalty, taken by {event_primary_player_name}, {details.minutes} minutes for {details.description}"),
+    (('shootout_shot',), [], "{event_team} shootout shot by {event_primary_player_name}"),
+    (('shootout_goal',), [('details.isGameWinningGoal', '==', False)], "{event_team} shootout goal by {event_primary_player_name}"),
+    (('shootout_goal',), [('details.isGameWinningGoal', '==', True)], "{event_team} game winning shootout goal by {event_primary_player_name}"),
+    (('start_of_game',), [], "{away_team} @ {home_team}, start of game"),
+    (('end_of_game',), [], "{away_team} @ {home_team}, end of game. Final score: {away_team} {away_score} - {home_score} {home_team}"),
+    (('penalty_shot_shot',), [], "{event_team} penalty shot attempt by {event_primary_player_name}"),
+    (('penalty_shot_goal',), [], "{event_team} penalty shot goal scored by {event_primary_player_name}"),
+]
+# columns that need formatting before they go into a description
+DESC_FORMATS = {
+    'details.minutes': lambda col: col.fillna("0").astype(float).astype(int).astype(str),
+    'away_score': lambda col: col.astype(str),
+    'home_score': lambda col: col.astype(str),
+}
+
+# format_pbp renames and the final output columns, in order
+OUTPUT_RENAMES = {"details.period.id":"period","details.xLocation":"xC","details.yLocation":"yC","details.shotType":"shot_type","details.shotQuality":"shot_quality",
+                  "details.properties.isPowerPlay":"is_power_play","details.properties.isShortHanded":"is_short_handed","details.properties.isEmptyNet":"is_on_empty_net",
+                  "details.properties.isPenaltyShot":"is_penalty_shot","details.properties.isGameWinningGoal":"is_game_winning_goal","details.time_seconds":"game_seconds_elapsed"}
+OUTPUT_COLUMNS = ['game_id','game_date','home_team','home_team_id','away_team','away_team_id','period','game_seconds_elapsed','game_minutes_elapsed','event','event_team',
+                  'event_primary_player_name','event_primary_player_id','event_primary_player_position','event_primary_player_sweater_number',
+                  'event_secondary_player_name','event_secondary_player_id','event_secondary_player_position','event_secondary_player_sweater_number',
+                  'event_tertiary_player_name','event_tertiary_player_id','event_tertiary_player_position','event_tertiary_player_sweater_number',
+                  'description','shot_type','shot_quality','is_power_play','is_short_handed','is_on_empty_net','is_penalty_shot','is_game_winning_goal',
+                  'xC','yC','away_score','home_score','current_home_goalie','current_away_goalie']
+# the columns add_misc_info sets from gameSummary, the same on every row of a game
+GAME_COLUMNS = ['home_team_id', 'home_team', 'away_team_id', 'away_team', 'game_id', 'game_date', 'game_season_id']
+# opt in typed schema (compact=True), same columns plus the season so games can be partitioned by it
+COMPACT_COLUMNS = OUTPUT_COLUMNS[:2] + ['game_season_id'] + OUTPUT_COLUMNS[2:]
+COMPACT_DTYPES = {
+    'game_id': 'Int32', 'game_season_id': 'Int16', 'home_team': 'category', 'home_team_id': 'Int16',
+    'away_team': 'category', 'away_team_id': 'Int16', 'period': 'Int8', 'game_seconds_elapsed': 'Int16',
+    'game_minutes_elapsed': 'float32', 'event': 'category', 'event_team': 'category',
+    'event_primary_player_id': 'Int32', 'event_primary_player_position': 'category', 'event_primary_player_sweater_number': 'Int8',
+    'event_secondary_player_id': 'Int32', 'event_secondary_player_position': 'category', 'event_secondary_player_sweater_number': 'Int8',
+    'event_tertiary_player_id': 'Int32', 'event_tertiary_player_position': 'category', 'event_tertiary_player_sweater_number': 'Int8',
+    'shot_type': 'category', 'shot_quality': 'category', 'is_power_play': 'boolean', 'is_short_handed': 'boolean',
+    'is_on_empty_net': 'boolean', 'is_penalty_shot': 'boolean', 'is_game_winning_goal': 'boolean',
+    'xC': 'float32', 'yC': 'float32', 'away_score': 'Int8', 'home_score': 'Int8',
+}
+# the feed writes flags as "1"/"0" strings, sometimes as real booleans
+FLAG_VALUES = {'1': True, '0': False, 1: True, 0: False, True: True, False: False}
+
 def normalize_period_columns(df):
     for col in ['details.period', 'details.period.id']:
         if col in df.columns:
@@ -39,83 +150,285 @@ def normalize_period_columns(df):
             df[col] = pd.to_numeric(df[col], errors='coerce')
     return df
 
-def scrape_game(game_id): 
+def scrape_game(game_id, session=None, cache=None, offline=False, compact=False, observer=None): 
     print("Scraping game {}...".format(game_id))
     try:
-        req = requests.get(
-            "https://lscluster.hockeytech.com/feed/index.php?feed=statviewfeed&view=gameCenterPlayByPlay&game_id={}&key=694cfeed58c932ee&client_code=pwhl&lang=en&league_id=&callback=angular.callbacks._8".format(game_id)
-        )
-        req.raise_for_status()
+        pbp_text = fetch_feed('gameCenterPlayByPlay', game_id, session, cache, offline, observer)
     except requests.exceptions.HTTPError as http_err:
         print(f"Play-by-Play API HTTP error occurred: {http_err}")
         print("This game does not exist! Please enter a valid game id.")
+        report_failure(observer, 'gameCenterPlayByPlay', http_err)
         return None
     except requests.exceptions.RequestException as req_exc:
         print(f"Play-by-Play API request failed: {req_exc}")
+        report_failure(observer, 'gameCenterPlayByPlay', req_exc)
+        return None
+    except LookupError as cache_err:
+        print(f"Play-by-Play cache miss: {cache_err}")
+        report_failure(observer, 'gameCenterPlayByPlay', cache_err)
         return None
     except ValueError as val_err:
         print(f"Play-by-Play API Value error occurred: {val_err}")
+        report_failure(observer, 'gameCenterPlayByPlay', val_err)
         return None
     else:
-        pbp_text = req.text
-        pbp = pd.json_normalize(extract_json(pbp_text))
-
-        # 🧼 Clean period fields centrally here
-        pbp = normalize_period_columns(pbp)
+        pbp = parse_pbp(pbp_text, observer)
 
         if len(pbp) == 0:
             print("This game does not exist! Please enter a valid game id.")
+            report_failure(observer, 'gameCenterPlayByPlay', ValueError("Game {} does not exist".format(game_id)))
             return None
         else:
-            pbp = add_header_trailer(pbp)
-            pbp = add_misc_info(pbp, game_id)
-            pbp = clean_pbp(pbp)
+            pbp = observed(observer, 'add_header_trailer', add_header_trailer, pbp)
+            pbp = add_misc_info(pbp, game_id, session=session, cache=cache, offline=offline, observer=observer)
+            pbp = clean_pbp(pbp, compact, observer)
+            if observer is not None:
+                observer('games', 1)
             print("Game {} finished.\n".format(game_id))
             return pbp
 
+def scrape_games(game_ids, max_workers=8, combine=True, cache=None, offline=False, session=None, compact=False, observer=None):
+    '''
+    scrape_games - Function to scrape many games at once. Both feeds of every game are requested in parallel
+                   over pooled sessions. Combined games are cleaned together in one pass (clean_games),
+                   otherwise each game is cleaned as soon as its two responses are in
+    parameters - game_ids - iterable of game ids, max_workers - number of threads making requests,
+                 combine - return one concatenated frame instead of a {game_id: frame} dict,
+                 cache - optional FeedCache, offline - rebuild the games from the cache without any requests,
+                 session - one session shared by every worker, defaults to a pooled session per thread,
+                 compact - return the typed schema from compact_pbp, observer - optional callback for metrics
+                 (see metrics.py), called from the worker threads too
+    returns - (games, failures), failures maps each game id that could not be scraped to its exception
+    '''
+    games, failures, _ = scrape_batch(game_ids, max_workers, combine, cache, offline, session, compact, observer)
+    return games, failures
+
+def scrape_batch(game_ids, max_workers=8, combine=True, cache=None, offline=False, session=None, compact=False, observer=None,
+                 per_game=None):
+    '''
+    scrape_batch - Function behind scrape_games, same parameters, plus per_game - optional function(game_id, pbp_text, misc_text)
+                   run on each game's raw responses (e.g. players.game_players) so nothing is downloaded twice
+    returns - (games, failures, {game_id: per_game result}) without the games that failed
+    '''
+    # each game once, in the order they were asked for
+    game_ids = list(dict.fromkeys(game_ids))
+    games = {}
+    failures = {}
+    extras = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        requested = {}
+        for game_id in game_ids:
+            requested[game_id] = (pool.submit(fetch_feed, 'gameCenterPlayByPlay', game_id, session, cache, offline, observer),
+                                  pool.submit(fetch_feed, 'gameSummary', game_id, session, cache, offline, observer))
+        raw = {}
+        for game_id in game_ids:
+            pbp_request, misc_request = requested.pop(game_id)
+            try:
+                if combine:
+                    raw[game_id] = parse_game(game_id, pbp_request.result(), misc_request.result(), observer)
+                else:
+                    games[game_id] = build_game(game_id, pbp_request.result(), misc_request.result(), compact, observer)
+                if per_game is not None:
+                    extras[game_id] = per_game(game_id, pbp_request.result(), misc_request.result())
+            except Exception as exc:
+                failures[game_id] = exc
+                report_failure(observer, 'game', exc)
+    if combine:
+        # one cleaning pass over every game
+        games, clean_failures = combine_games(raw, compact, observer)
+        failures.update(clean_failures)
+    if observer is not None:
+        observer('games', len(game_ids) - len(failures))
+    return games, failures, {game_id: extra for game_id, extra in extras.items() if game_id not in failures}
+
+def build_game(game_id, pbp_text, misc_text, compact=False, observer=None):
+    # run the whole pipeline on already downloaded feeds
+    return clean_games(parse_game(game_id, pbp_text, misc_text, observer), compact, observer)
+
+def parse_game(game_id, pbp_text, misc_text, observer=None):
+    # raw events of one game with the gameSummary columns added, what clean_games takes
+    pbp = parse_pbp(pbp_text, observer)
+    if len(pbp) == 0:
+        raise ValueError("Game {} does not exist".format(game_id))
+    return add_misc_info(pbp, game_id, misc_text, observer=observer)
+
+def clean_games(pbp, compact=False, observer=None):
+    '''
+    clean_games - Function to clean any number of games in one pass, every stage works game by game on a
+                  frame holding many of them, so a season pays the pandas overhead of each stage once
+    parameters - pbp - raw games from parse_game, one after another (pd.concat of them),
+                 compact - return the typed schema from compact_pbp, observer - optional callback for metrics
+    '''
+    pbp = observed(observer, 'add_header_trailer', add_header_trailer, pbp)
+    return clean_pbp(pbp, compact, observer)
+
+def combine_games(raw, compact=False, observer=None):
+    '''
+    combine_games - Function to clean a {game_id: raw frame} dict (see parse_game) into one frame
+                    If the batch fails the games are cleaned one by one so only the bad ones are lost
+    returns - (frame, failures)
+    '''
+    failures = {}
+    if not raw:
+        return pd.DataFrame(), failures
+    try:
+        games = clean_games(pd.concat(raw.values(), ignore_index=True), compact, observer)
+    except Exception:
+        games = []
+        for game_id, pbp in raw.items():
+            try:
+                games.append(clean_games(pbp, compact, observer))
+            except Exception as exc:
+                failures[game_id] = exc
+                report_failure(observer, 'clean', exc)
+        if not games:
+            return pd.DataFrame(), failures
+        games = pd.concat(games)
+    games = games.reset_index(drop=True)
+    if compact:
+        # categories differ from game to game so concat falls back to object, put them back
+        games = compact_dtypes(games)
+    return games, failures
 
+def parse_pbp(pbp_text, observer=None):
+    pbp_json = observed(observer, 'extract_json', extract_json, pbp_text)
+    pbp = observed(observer, 'build_events', build_events, pbp_json)
+    # 🧼 Clean period fields centrally here
+    pbp = observed(observer, 'normalize_period_columns', normalize_period_columns, pbp)
+    return pbp
 
-def extract_json(pbp_text):
-    pattern = r'angular\.callbacks\._\d+\('
-    json_str = re.sub(pattern, '', pbp_text).rstrip(');')
-    pbp_json = json.loads(json_str)
-    return pbp_json
+def observed(observer, stage, func, *args):
+    # run one step, telling the observer how long it took and how many rows came out
+    if observer is None:
+        return func(*args)
+    start = time.perf_counter()
+    result = func(*args)
+    observer('stage_seconds', time.perf_counter() - start, stage=stage)
+    observer('stage_rows', len(result), stage=stage)
+    return result
 
+def report_failure(observer, stage, exc):
+    if observer is not None:
+        observer('failures', 1, stage=stage, error=type(exc).__name__)
+
+def build_events(pbp_json):
+    '''
+    build_events - Function to turn the decoded play-by-play feed into a data frame in one pass over the events
+                   Only the fields in DETAIL_FIELDS and the first MAX_ASSISTS assists are pulled out, with the
+                   same column names and values pd.json_normalize gives them
+    parameters - pbp_json - the list of events from the gameCenterPlayByPlay feed
+    '''
+    n = len(pbp_json)
+    columns = {'event': [np.nan] * n}
+    # one slot per output column, keyed the same way as the feed so each event is a couple of dict lookups
+    slots = {}
+    for key, fields in DETAIL_FIELDS.items():
+        if fields is None:
+            columns['details.' + key] = slots[key] = [np.nan] * n
+        else:
+            slots[key] = {}
+            for field in fields:
+                columns['details.{}.{}'.format(key, field)] = slots[key][field] = [np.nan] * n
+    assist_slots = []
+    for a in range(1, MAX_ASSISTS + 1):
+        assist_slots.append({})
+        for field in PLAYER_FIELDS:
+            columns['assistor_{}_{}'.format(a, field)] = assist_slots[-1][field] = [np.nan] * n
+
+    for i, play in enumerate(pbp_json):
+        if 'event' in play:
+            columns['event'][i] = play['event']
+        details = play.get('details')
+        if not isinstance(details, dict):
+            continue
+        for key, value in details.items():
+            slot = slots.get(key)
+            if slot is None:
+                continue
+            if isinstance(slot, list):
+                slot[i] = value
+            elif isinstance(value, dict):
+                for field, field_slot in slot.items():
+                    if field in value:
+                        field_slot[i] = value[field]
+        assists = details.get('assists')
+        if isinstance(assists, list):
+            for assist, assist_slot in zip(assists, assist_slots):
+                if not isinstance(assist, dict):
+                    continue
+                for field, field_slot in assist_slot.items():
+                    if field in assist:
+                        field_slot[i] = assist[field]
+    return pd.DataFrame(columns)
 
 def add_header_trailer(pbp):
-    empty_row = pd.DataFrame({col: np.nan for col in pbp.columns}, index=[0])
+    # a start_of_game row before and an end_of_game row after every game, a frame of several games has to
+    # have each game's rows together (like pd.concat of the games gives)
     pbp['details.time'] = pbp['details.time'].fillna("5:00")
     pbp['details.period.id'] = pbp['details.period.id'].fillna("5")
-    pbp = pd.concat([empty_row, pbp], ignore_index=True)
-    pbp.iloc[0, pbp.columns.get_loc('details.time')] = "0:00"
-    pbp.iloc[0, pbp.columns.get_loc('details.period.id')] = "1"
-    pbp.iloc[0, pbp.columns.get_loc('event')] = "start_of_game"
-    max_period = pbp['details.period.id'].max()
-    if "shootout" in pbp['event'].value_counts().keys().tolist():
-        max_period = 5
-    pbp = pd.concat([pbp, empty_row], ignore_index=True)
-    pbp.loc[pbp.index[-1], 'details.period.id'] = max_period
+    n = len(pbp)
+    game = game_keys(pbp)
+    starts = np.flatnonzero(np.r_[True, game[1:] != game[:-1]]) if n else np.array([], dtype=int)
+    ends = np.r_[starts[1:], n].astype(int)
+    n_games = len(starts)
+    # periods are numeric after normalize_period_columns but the header row is a string, compare as numbers
+    periods = pd.to_numeric(pbp['details.period.id'], errors='coerce').to_numpy(dtype=float)
+    max_period = np.fmax(np.fmax.reduceat(periods, starts), 1) if n else periods
+    shootout = np.logical_or.reduceat((pbp['event'] == 'shootout').to_numpy(), starts) if n else periods
+    extra = pd.DataFrame({col: np.nan for col in pbp.columns}, index=range(2 * n_games))
+    # game level columns (add_misc_info) are the same on every row of a game
+    for col in GAME_COLUMNS:
+        if col in pbp.columns:
+            extra[col] = pbp[col].iloc[np.r_[starts, starts]].to_numpy()
+    trailer_period = np.empty(n_games, dtype=object)
+    trailer_period[:] = [5 if so else period for so, period in zip(shootout, max_period)]
+    fills = {
+        'event': ("start_of_game", "end_of_game"),
+        'details.time': ("0:00", pbp['details.time'].to_numpy(dtype=object)[ends - 1]),
+        'details.period.id': ("1", trailer_period),
+    }
+    # put each game's header before and trailer after its rows
+    out_starts = starts + 2 * np.arange(n_games)
+    out_ends = ends + 2 * np.arange(n_games) + 1
+    order = np.empty(n + 2 * n_games, dtype=int)
+    events = np.ones(len(order), dtype=bool)
+    events[out_starts] = events[out_ends] = False
+    order[events] = np.arange(n)
+    order[out_starts] = n + np.arange(n_games)
+    order[out_ends] = n + n_games + np.arange(n_games)
+    pbp = pd.concat([pbp, extra], ignore_index=True).take(order).reset_index(drop=True)
+    for col, (header, trailer) in fills.items():
+        values = pbp[col].to_numpy(dtype=object)
+        values[out_starts] = header
+        values[out_ends] = trailer
+        pbp[col] = values
     pbp['shifted_time'] = pbp['details.time'].shift(1)
-    pbp.loc[pbp.index[-1], 'event'] = "end_of_game"
-    pbp.loc[pbp['event'] == 'end_of_game', 'details.time'] = pbp['shifted_time']
     return pbp
 
 
-def add_misc_info(pbp,game_id):
+def add_misc_info(pbp, game_id, misc_text=None, session=None, cache=None, offline=False, observer=None):
     #For tons more of misc info not on the regualr pbp endpoint go to https://api-web.nhle.com/v1/gamecenter/2022030237/landing
+    # misc_text can be passed in when the gameSummary feed was already downloaded (see scrape_games)
     try:
-        req = requests.get("https://lscluster.hockeytech.com/feed/index.php?feed=statviewfeed&view=gameSummary&game_id={}&key=694cfeed58c932ee&site_id=2&client_code=pwhl&lang=en&league_id=&callback=angular.callbacks._6".format(game_id))
-        req.raise_for_status()
+        if misc_text is None:
+            misc_text = fetch_feed('gameSummary', game_id, session, cache, offline, observer)
     except requests.exceptions.RequestException as req_exc:
         print(f"Gamecenter API request failed: {req_exc}")
+        report_failure(observer, 'gameSummary', req_exc)
+    except LookupError as cache_err:
+        print(f"Gamecenter cache miss: {cache_err}")
+        report_failure(observer, 'gameSummary', cache_err)
     # Handle HTTP errors
     except requests.exceptions.HTTPError as http_err:
         print(f"Gamecenter API HTTP error occurred: {http_err}")
+        report_failure(observer, 'gameSummary', http_err)
     # Handle value-related issues
     except ValueError as val_err:
         print(f"Gamecenter API Value error occured: {val_err}")
+        report_failure(observer, 'gameSummary', val_err)
     else:
-        misc_text = req.text 
+        if observer is not None:
+            start = time.perf_counter()
         misc_json = extract_json(misc_text)
         home_team_id = misc_json['homeTeam']['info']['id']
         home_team_abbrev = misc_json['homeTeam']['info']['abbreviation']
@@ -131,29 +444,18 @@ def add_misc_info(pbp,game_id):
         pbp['game_id'] = game_id
         pbp['game_date']=date
         pbp['game_season_id'] = season_id
+        if observer is not None:
+            observer('stage_seconds', time.perf_counter() - start, stage='add_misc_info')
+            observer('stage_rows', len(pbp), stage='add_misc_info')
     return pbp
 
-def clean_pbp(pbp):
-    # make sure all columns are here
-    pbp = check_columns(pbp)
-    # adding this function in to catch any weird data issues
-    pbp = check_values(pbp)
-    # clean players, to add in event players
-    pbp = clean_players(pbp)
-    # clean events
-    pbp = clean_events(pbp)
-    # clean teams
-    pbp = clean_teams(pbp)
-    # clean time
-    pbp = clean_time(pbp)
-    # add goalies
-    pbp = add_goalies(pbp)
-    # add score
-    pbp = add_score(pbp)
-    # build description
-    pbp = build_desc(pbp)
-    # format
-    pbp = format_pbp(pbp)
+def clean_pbp(pbp, compact=False, observer=None):
+    # runs every stage in CLEAN_STAGES (bottom of the file) in order, compact swaps format_pbp for compact_pbp
+    # observer (see metrics.py) gets each stage's time and row count
+    for stage in CLEAN_STAGES:
+        if compact and stage is format_pbp:
+            stage = compact_pbp
+        pbp = observed(observer, stage.__name__, stage, pbp)
     return pbp
 
 def check_columns(pbp):
@@ -168,76 +470,30 @@ def check_columns(pbp):
     return pbp
 
 def clean_players(pbp):
-    # shot, block, shootout, penaltyshot primary
-    pbp.loc[(pbp['event']=='shot')|(pbp['event']=='blocked_shot')|(pbp['event']=='shootout')|(pbp['event']=='penaltyshot'),'event_primary_player_name'] = pbp['details.shooter.firstName'].apply(str) + ' ' +pbp['details.shooter.lastName'].apply(str)
-    pbp.loc[(pbp['event']=='shot')|(pbp['event']=='blocked_shot')|(pbp['event']=='shootout')|(pbp['event']=='penaltyshot'),'event_primary_player_id'] = pbp['details.shooter.id']
-    pbp.loc[(pbp['event']=='shot')|(pbp['event']=='blocked_shot')|(pbp['event']=='shootout')|(pbp['event']=='penaltyshot'),'event_primary_player_position'] = pbp['details.shooter.position']
-    pbp.loc[(pbp['event']=='shot')|(pbp['event']=='blocked_shot')|(pbp['event']=='shootout')|(pbp['event']=='penaltyshot'),'event_primary_player_sweater_number'] = pbp['details.shooter.jerseyNumber'].fillna("0").astype(int)
-    # faceoff, home win
-    pbp.loc[((pbp['event']=='faceoff')&(pbp['details.homeWin']=='1')),'event_primary_player_name'] = pbp['details.homePlayer.firstName'].apply(str) + ' ' +pbp['details.homePlayer.lastName'].apply(str)
-    pbp.loc[((pbp['event']=='faceoff')&(pbp['details.homeWin']=='1')),'event_primary_player_id'] = pbp['details.homePlayer.id']
-    pbp.loc[((pbp['event']=='faceoff')&(pbp['details.homeWin']=='1')),'event_primary_player_position'] = pbp['details.homePlayer.position']
-    pbp.loc[((pbp['event']=='faceoff')&(pbp['details.homeWin']=='1')),'event_primary_player_sweater_number'] = pbp['details.homePlayer.jerseyNumber'].fillna("0").astype(int)
-    pbp.loc[((pbp['event']=='faceoff')&(pbp['details.homeWin']=='1')),'event_secondary_player_name'] = pbp['details.visitingPlayer.firstName'].apply(str) + ' ' +pbp['details.visitingPlayer.lastName'].apply(str)
-    pbp.loc[((pbp['event']=='faceoff')&(pbp['details.homeWin']=='1')),'event_secondary_player_id'] = pbp['details.visitingPlayer.id']
-    pbp.loc[((pbp['event']=='faceoff')&(pbp['details.homeWin']=='1')),'event_secondary_player_position'] = pbp['details.visitingPlayer.position']
-    pbp.loc[((pbp['event']=='faceoff')&(pbp['details.homeWin']=='1')),'event_secondary_player_sweater_number'] = pbp['details.visitingPlayer.jerseyNumber'].fillna("0").astype(int)
-    # faceoff, away win
-    pbp.loc[((pbp['event']=='faceoff')&(pbp['details.homeWin']=='0')),'event_primary_player_name'] = pbp['details.visitingPlayer.firstName'].apply(str) + ' ' +pbp['details.visitingPlayer.lastName'].apply(str)
-    pbp.loc[((pbp['event']=='faceoff')&(pbp['details.homeWin']=='0')),'event_primary_player_id'] = pbp['details.visitingPlayer.id']
-    pbp.loc[((pbp['event']=='faceoff')&(pbp['details.homeWin']=='0')),'event_primary_player_position'] = pbp['details.visitingPlayer.position']
-    pbp.loc[((pbp['event']=='faceoff')&(pbp['details.homeWin']=='0')),'event_primary_player_sweater_number'] = pbp['details.visitingPlayer.jerseyNumber'].fillna("0").astype(int)
-    pbp.loc[((pbp['event']=='faceoff')&(pbp['details.homeWin']=='0')),'event_secondary_player_name'] = pbp['details.homePlayer.firstName'].apply(str) + ' ' +pbp['details.homePlayer.lastName'].apply(str)
-    pbp.loc[((pbp['event']=='faceoff')&(pbp['details.homeWin']=='0')),'event_secondary_player_id'] = pbp['details.homePlayer.id']
-    pbp.loc[((pbp['event']=='faceoff')&(pbp['details.homeWin']=='0')),'event_secondary_player_position'] = pbp['details.homePlayer.position']
-    pbp.loc[((pbp['event']=='faceoff')&(pbp['details.homeWin']=='0')),'event_secondary_player_sweater_number'] = pbp['details.homePlayer.jerseyNumber'].fillna("0").astype(int)
-    # goalie change, coming in
-    pbp.loc[pbp['event']=='goalie_change','event_primary_player_name'] = pbp['details.goalieComingIn.firstName'].apply(str) + ' ' +pbp['details.goalieComingIn.lastName'].apply(str)
-    pbp.loc[pbp['event']=='goalie_change','event_primary_player_id'] = pbp['details.goalieComingIn.id']
-    pbp.loc[pbp['event']=='goalie_change','event_primary_player_position'] = pbp['details.goalieComingIn.position']
-    pbp.loc[pbp['event']=='goalie_change','event_primary_player_sweater_number'] = pbp['details.goalieComingIn.jerseyNumber'].fillna("0").astype(int)
-    # goalie chhange, going out, switching goalie
-    pbp.loc[((pbp['event']=='goalie_change')&(pbp['details.goalieComingIn.id'].isna()==0)),'event_secondary_player_name'] = pbp['details.goalieGoingOut.firstName'].apply(str) + ' ' +pbp['details.goalieGoingOut.lastName'].apply(str)
-    pbp.loc[((pbp['event']=='goalie_change')&(pbp['details.goalieComingIn.id'].isna()==0)),'event_secondary_player_id'] = pbp['details.goalieGoingOut.id']
-    pbp.loc[((pbp['event']=='goalie_change')&(pbp['details.goalieComingIn.id'].isna()==0)),'event_secondary_player_position'] = pbp['details.goalieGoingOut.position']
-    pbp.loc[((pbp['event']=='goalie_change')&(pbp['details.goalieComingIn.id'].isna()==0)),'event_secondary_player_sweater_number'] = pbp['details.goalieGoingOut.jerseyNumber'].fillna("0").astype(int)
-    # goalie change, going out, pulling goalie
-    pbp.loc[((pbp['event']=='goalie_change')&(pbp['details.goalieComingIn.id'].isna()==1)),'event_primary_player_name'] = pbp['details.goalieGoingOut.firstName'].apply(str) + ' ' +pbp['details.goalieGoingOut.lastName'].apply(str)
-    pbp.loc[((pbp['event']=='goalie_change')&(pbp['details.goalieComingIn.id'].isna()==1)),'event_primary_player_id'] = pbp['details.goalieGoingOut.id']
-    pbp.loc[((pbp['event']=='goalie_change')&(pbp['details.goalieComingIn.id'].isna()==1)),'event_primary_player_position'] = pbp['details.goalieGoingOut.position']
-    pbp.loc[((pbp['event']=='goalie_change')&(pbp['details.goalieComingIn.id'].isna()==1)),'event_primary_player_sweater_number'] = pbp['details.goalieGoingOut.jerseyNumber'].fillna("0").astype(int)
-    # penalty, taken by
-    pbp.loc[pbp['event']=='penalty','event_primary_player_name'] = pbp['details.takenBy.firstName'].apply(str) + ' ' +pbp['details.takenBy.lastName'].apply(str)
-    pbp.loc[pbp['event']=='penalty','event_primary_player_id'] = pbp['details.takenBy.id']
-    pbp.loc[pbp['event']=='penalty','event_primary_player_position'] = pbp['details.takenBy.position']
-    pbp.loc[pbp['event']=='penalty','event_primary_player_sweater_number'] = pbp['details.takenBy.jerseyNumber'].fillna("0").astype(int)
-    # hit primary
-    pbp.loc[pbp['event']=='hit','event_primary_player_name'] = pbp['details.player.firstName'].apply(str) + ' ' + pbp['details.player.lastName'].apply(str)
-    pbp.loc[pbp['event']=='hit','event_primary_player_id'] = pbp['details.player.id']
-    pbp.loc[pbp['event']=='hit','event_primary_player_position'] = pbp['details.player.position']
-    pbp.loc[pbp['event']=='hit','event_primary_player_sweater_number'] = pbp['details.player.jerseyNumber'].fillna("0").astype(int)
-    # block secondary
-    pbp.loc[(pbp['event']=='blocked_shot'),'event_secondary_player_name'] = pbp['details.blocker.firstName'].apply(str) + ' ' +pbp['details.shooter.firstName'].apply(str)
-    pbp.loc[(pbp['event']=='blocked_shot'),'event_secondary_player_id'] = pbp['details.blocker.id']
-    pbp.loc[(pbp['event']=='blocked_shot'),'event_secondary_player_position'] = pbp['details.blocker.position']
-    pbp.loc[(pbp['event']=='blocked_shot'),'event_secondary_player_sweater_number'] = pbp['details.blocker.jerseyNumber'].fillna("0").astype(int)
-    # goal primary
-    pbp.loc[pbp['event']=='goal','event_primary_player_name'] = pbp['details.scoredBy.firstName'].apply(str) + ' ' + pbp['details.scoredBy.lastName'].apply(str)
-    pbp.loc[pbp['event']=='goal','event_primary_player_id'] = pbp['details.scoredBy.id']
-    pbp.loc[pbp['event']=='goal','event_primary_player_position'] = pbp['details.scoredBy.position']
-    pbp.loc[pbp['event']=='goal','event_primary_player_sweater_number'] = pbp['details.scoredBy.jerseyNumber'].fillna("0").astype(int)
-    # need to extract assists
-    pbp = extract_assists(pbp)
-    # goal secondary
-    pbp.loc[pbp['event']=='goal','event_secondary_player_name'] = pbp['assistor_1_firstName'].apply(str) + ' ' + pbp['assistor_1_lastName'].apply(str)
-    pbp.loc[pbp['event']=='goal','event_secondary_player_id'] = pbp['assistor_1_id']
-    pbp.loc[pbp['event']=='goal','event_secondary_player_position'] = pbp['assistor_1_position']
-    pbp.loc[pbp['event']=='goal','event_secondary_player_sweater_number'] = pbp['assistor_1_jerseyNumber']
-    # goal tertiary
-    pbp.loc[pbp['event']=='goal','event_tertiary_player_name'] = pbp['assistor_2_firstName'].apply(str) + ' ' + pbp['assistor_2_lastName'].apply(str)
-    pbp.loc[pbp['event']=='goal','event_tertiary_player_id'] = pbp['assistor_2_id']
-    pbp.loc[pbp['event']=='goal','event_tertiary_player_position'] = pbp['assistor_2_position']
-    pbp.loc[pbp['event']=='goal','event_tertiary_player_sweater_number'] = pbp['assistor_2_jerseyNumber'].fillna("0").astype(int)
+    # need to extract assists, build_events already flattens them but a json_normalize'd frame won't have them
+    if 'assistor_1_id' not in pbp.columns:
+        pbp = extract_assists(pbp)
+    masks = event_masks(pbp)
+    n = len(pbp)
+    fields = {}
+    for events, conditions, role, source, quirks in PLAYER_RULES:
+        rows = rule_rows(pbp, masks, events, conditions)
+        if len(rows) == 0:
+            continue
+        first, last = quirks.get('name', (source + 'firstName', source + 'lastName'))
+        names = [str(f) + ' ' + str(l) for f, l in zip(pbp[first].to_numpy()[rows], pbp[last].to_numpy()[rows])]
+        sweater = pbp[source + 'jerseyNumber'].iloc[rows]
+        if not quirks.get('raw_sweater_number'):
+            sweater = sweater.fillna("0").astype(int)
+        prefix = 'event_{}_player_'.format(role)
+        fields.setdefault(prefix + 'name', []).append((rows, np.array(names, dtype=object)))
+        fields.setdefault(prefix + 'id', []).append((rows, pbp[source + 'id'].to_numpy()[rows]))
+        fields.setdefault(prefix + 'position', []).append((rows, pbp[source + 'position'].to_numpy()[rows]))
+        fields.setdefault(prefix + 'sweater_number', []).append((rows, sweater.to_numpy()))
+    for role in ('primary', 'secondary', 'tertiary'):
+        for field in ('name', 'id', 'position', 'sweater_number'):
+            col = 'event_{}_player_{}'.format(role, field)
+            pbp[col] = fill_rows(n, fields.get(col, []))
     # goalie against
     pbp['goalie_against_name'] = pbp['details.goalie.firstName'] + " " + pbp['details.goalie.lastName'] 
     pbp['goalie_against_id'] = pbp['details.goalie.id']
@@ -287,8 +543,9 @@ def clean_events(pbp):
     pbp.loc[pbp['event']=="goal",'details.isGoal'] = True
     pbp.loc[(pbp['event']=="shot")&(pbp['details.isGoal']==True),'delete_this_row'] = 1
     pbp.loc[(pbp['event']=="shot")&(pbp['details.isGoal']==True),'details.isGoal'] = False
-    pbp['shifted_shot_type'] = pbp['details.shotType'].shift(1)
-    pbp['shifted_shot_quality'] = pbp['details.shotQuality'].shift(1)
+    game = game_keys(pbp)
+    pbp['shifted_shot_type'] = pbp['details.shotType'].groupby(game, sort=False).shift(1)
+    pbp['shifted_shot_quality'] = pbp['details.shotQuality'].groupby(game, sort=False).shift(1)
     pbp.loc[pbp['event']=="goal",'details.shotType'] = pbp['shifted_shot_type']
     pbp.loc[pbp['event']=="goal",'details.shotQuality'] = pbp['shifted_shot_quality']
     pbp = pbp[pbp['delete_this_row']!=1]
@@ -296,74 +553,84 @@ def clean_events(pbp):
 
 def clean_teams(pbp):
     pbp = pbp.astype(object)
-    # goal
-    pbp.loc[(pbp['event']=='goal'),'event_team_id'] =  pbp['details.team.id'].fillna("0").astype(int)
-    # shot, blocked shot
-    pbp.loc[(pbp['event']=='shot')|(pbp['event']=='blocked_shot')|(pbp['event']=='shootout_shot')|(pbp['event']=='shootout_goal'),'event_team_id'] =  pbp['details.shooterTeamId'].fillna("0").astype(int)
-    # faceoff
-    pbp.loc[(pbp['event']=='faceoff')&(pbp['details.homeWin']=="1"),'event_team_id'] =  pbp['home_team_id'].fillna("0").astype(int)
-    pbp.loc[(pbp['event']=='faceoff')&(pbp['details.homeWin']=="0"),'event_team_id'] =  pbp['away_team_id'].fillna("0").astype(int)
-    # hit
-    pbp.loc[(pbp['event']=='hit'),'event_team_id'] =  pbp['details.teamId'].fillna("0").astype(int)
-    # penalty
-    pbp.loc[(pbp['event']=='penalty'),'event_team_id'] =  pbp['details.againstTeam.id'].fillna("0").astype(int)
-    # penalty shot
-    pbp.loc[(pbp['event']=='penalty_shot_shot')|(pbp['event']=='penalty_shot_goal'),'event_team_id'] =  pbp['details.shooter_team.id'].fillna("0").astype(int)
-    # goalie change
-    pbp.loc[(pbp['event']=='goalie_entrance'),'event_team_id'] =  pbp['details.team_id'].fillna("0").astype(int)
-    pbp.loc[(pbp['event']=='goalie_pull'),'event_team_id'] =  pbp['details.team_id'].fillna("0").astype(int)
-    pbp.loc[(pbp['event']=='goalie_sub'),'event_team_id'] =  pbp['details.team_id'].fillna("0").astype(int)
-    # shootout
-    pbp.loc[(pbp['event']=='shootout_shot')|(pbp['event']=='shootout_goal'),'event_team_id'] = pbp['details.shooterTeam.id'].fillna("0").astype(int)
-    pbp['event_team_id'] = pbp['event_team_id'].fillna("0").astype(int)
-    # map team abbrev
-    home_id = pbp.iloc[0]['home_team_id']
-    home_name = pbp.iloc[0]['home_team']
-    away_id = pbp.iloc[0]['away_team_id']
-    away_name = pbp.iloc[0]['away_team']
-    team_dict = {}
-    team_dict[home_id] = home_name
-    team_dict[away_id] = away_name
-    pbp['event_team'] = pbp['event_team_id'].map(team_dict)
+    masks = event_masks(pbp)
+    event_team_id = np.zeros(len(pbp), dtype=int)
+    for events, conditions, source in TEAM_RULES:
+        rows = rule_rows(pbp, masks, events, conditions)
+        if len(rows):
+            event_team_id[rows] = pbp[source].iloc[rows].fillna("0").astype(int).to_numpy()
+    pbp['event_team_id'] = event_team_id
+    # map team abbrev, row by row so a frame can hold more than one game
+    home = np.where(event_team_id == pbp['home_team_id'].to_numpy(), pbp['home_team'].to_numpy(), np.nan)
+    pbp['event_team'] = np.where(event_team_id == pbp['away_team_id'].to_numpy(), pbp['away_team'].to_numpy(), home)
     return pbp
 
 def build_desc(pbp):
-    pbp['description'] = ""
-    # goal
-    pbp.loc[(pbp['event']=='goal')&(pbp['event_secondary_player_id'].isna()==True),'description'] = pbp['event_team']+ " goal scored by "+ pbp['event_primary_player_name'] + ", unassisted"
-    pbp.loc[(pbp['event']=='goal')&(pbp['event_secondary_player_id'].isna()==False)&(pbp['event_tertiary_player_id'].isna()==True),'description'] = pbp['event_team']+ " goal scored by "+ pbp['event_primary_player_name'] + ", assisted by " + pbp['event_secondary_player_name']
-    pbp.loc[(pbp['event']=='goal')&(pbp['event_secondary_player_id'].isna()==False)&(pbp['event_tertiary_player_id'].isna()==False),'description'] = pbp['event_team']+ " goal scored by "+ pbp['event_primary_player_name'] + ", assisted by " + pbp['event_secondary_player_name'] + " and " +  pbp['event_tertiary_player_name']
-    # shot
-    pbp.loc[(pbp['event']=='shot'),'description'] = pbp['event_team']+ " shot by "+ pbp['event_primary_player_name']
-    # blocked shot
-    pbp.loc[(pbp['event']=='blocked_shot'),'description'] = pbp['event_team']+ " blocked shot, shot by "+ pbp['event_primary_player_name'] + ', blocked by ' + " " + pbp['event_secondary_player_name']
-    # faceoff
-    pbp.loc[(pbp['event']=='faceoff')&(pbp['details.homeWin']=='0'),'description'] = pbp['event_team']+ " faceoff won by "+ pbp['event_primary_player_name'] + ', lost by '+ pbp['home_team'] + ' ' +pbp['event_secondary_player_name']
-    pbp.loc[(pbp['event']=='faceoff')&(pbp['details.homeWin']=='1'),'description'] = pbp['event_team']+ " faceoff won by "+ pbp['event_primary_player_name'] + ', lost by '+ pbp['away_team'] + ' ' +pbp['event_secondary_player_name']
-    # hit
-    pbp.loc[(pbp['event']=='hit'),'description'] = pbp['event_team']+ " hit thrown by "+ pbp['event_primary_player_name']
-    # goalie change
-    pbp.loc[(pbp['event']=='goalie_sub'),'description'] = pbp['event_team']+ " goalie substitution, "+ pbp['event_primary_player_name'] + " entering the game for " + pbp['event_secondary_player_name']
-    pbp.loc[(pbp['event']=='goalie_pull'),'description'] = pbp['event_team']+ " goalie pull,  "+ pbp['event_primary_player_name'] + " being pulled from the game"
-    pbp.loc[(pbp['event']=='goalie_entrance'),'description'] = pbp['event_team']+ " goalie entrance, " + pbp['event_primary_player_name'] + " entering the game"
-    # penalty
-    pbp.loc[(pbp['event']=='penalty'),'description'] = pbp['event_team']+ " penalty, taken by " + pbp['event_primary_player_name'] + ", " + pbp['details.minutes'].fillna("0").astype(float).astype(int).astype(str)+ " minutes for " + pbp['details.description']
-    # shootout shot
-    pbp.loc[pbp['event']=="shootout_shot",'description'] = pbp['event_team'] + " shootout shot by " + pbp['event_primary_player_name']
-    # shootout goal
-    pbp.loc[(pbp['event']=="shootout_goal")&(pbp['details.isGameWinningGoal']==False),'description'] = pbp['event_team'] + " shootout goal by " + pbp['event_primary_player_name']
-    # shootout goal
-    pbp.loc[(pbp['event']=="shootout_goal")&(pbp['details.isGameWinningGoal']==True),'description'] = pbp['event_team'] + " game winning shootout goal by " + pbp['event_primary_player_name']
-    # game start
-    pbp.loc[pbp['event']=='start_of_game','description'] = pbp['away_team'] + " @ " + pbp['home_team'] + ", start of game"
-    # game end
-    pbp.loc[pbp['event']=='end_of_game','description'] = pbp['away_team'] + " @ " + pbp['home_team'] + ", end of game. Final score: " + pbp['away_team'] + " " + pbp['away_score'].astype(str) + " - " + pbp['home_score'].astype(str) + " " + pbp['home_team']
-    # penalty shot shot
-    pbp.loc[pbp['event']=='penalty_shot_shot','description'] = pbp['event_team'] + " penalty shot attempt by " + pbp['event_primary_player_name']
-    # penalty shot goal
-    pbp.loc[pbp['event']=='penalty_shot_goal','description'] = pbp['event_team'] + " penalty shot goal scored by " + pbp['event_primary_player_name']
+    masks = event_masks(pbp)
+    description = np.full(len(pbp), "", dtype=object)
+    for events, conditions, template in DESC_RULES:
+        rows = rule_rows(pbp, masks, events, conditions)
+        if len(rows) == 0:
+            continue
+        pieces = []
+        for literal, col, _, _ in string.Formatter().parse(template):
+            if literal:
+                pieces.append(np.full(len(rows), literal, dtype=object))
+            if col is not None:
+                values = pbp[col].iloc[rows]
+                if col in DESC_FORMATS:
+                    values = DESC_FORMATS[col](values)
+                pieces.append(values.to_numpy(dtype=object))
+        description[rows] = [''.join(row) if all(isinstance(piece, str) for piece in row) else np.nan for row in zip(*pieces)]
+    pbp['description'] = description
     return pbp
 
+def game_keys(pbp):
+    # the game each row belongs to, a frame without game_id is one game
+    if 'game_id' in pbp.columns:
+        return pbp['game_id'].to_numpy()
+    return np.zeros(len(pbp), dtype=int)
+
+def event_masks(pbp):
+    # one boolean mask per event type, from a single factorize of the event column
+    codes, events = pd.factorize(pbp['event'])
+    return {event: codes == i for i, event in enumerate(events)}
+
+def rule_rows(pbp, masks, events, conditions):
+    # positions of the rows of these event types that also meet every condition
+    mask = None
+    for event in events:
+        if event in masks:
+            mask = masks[event] if mask is None else mask | masks[event]
+    if mask is None:
+        return np.array([], dtype=int)
+    rows = np.flatnonzero(mask)
+    for condition in conditions:
+        values = pbp[condition[0]].iloc[rows]
+        if condition[1] == 'isna':
+            keep = values.isna()
+        elif condition[1] == 'notna':
+            keep = values.notna()
+        else:
+            keep = values == condition[2]
+        rows = rows[keep.to_numpy()]
+    return rows
+
+def fill_rows(n, parts):
+    '''
+    fill_rows - Function to build a column from (rows, values) pieces, later pieces overwrite earlier ones
+                Ends up typed the way repeated .loc assignments into a new column would be, float if every
+                piece is numeric and object otherwise
+    parameters - n - length of the column, parts - list of (row positions, values)
+    '''
+    numeric = all(values.dtype.kind in 'iuf' for rows, values in parts)
+    col = np.full(n, np.nan, dtype=float if numeric else object)
+    for rows, values in parts:
+        if not numeric and values.dtype.kind in 'iuf':
+            values = values.astype(float).astype(object)
+        col[rows] = values
+    return col
+
 def clean_time(pbp):
     # function to convert time elapsed to seconds
     pbp['details.time'] = pbp['details.time'].fillna("5:00")
@@ -390,34 +657,25 @@ def convert_to_seconds_vectorized(shifts, col_names):
 
 # add goalies
 def add_goalies(pbp):
-    # Initialize dictionaries to keep track of the current goalies for home and away teams
-    current_home_goalies = {}  # Format: {game_id: goalie_name}
-    current_away_goalies = {}  # Format: {game_id: goalie_name}
-    
-    # Initialize lists to hold the current goalie for each event for home and away teams
-    current_home_goalie_per_event = []
-    current_away_goalie_per_event = []
-
-    # Iterate through each row in the DataFrame
-    for index, row in pbp.iterrows():
-        if (row['event'] == 'goalie_entrance')|(row['event'] == 'goalie_sub'):
-            # Update the current goalie for the corresponding team
-            if row['event_team'] == row['home_team']:
-                current_home_goalies[row['game_id']] = row['event_primary_player_name']
-            else:
-                current_away_goalies[row['game_id']] = row['event_primary_player_name']
-        elif row['event'] == 'goalie_pull':
-            if row['event_team'] == row['home_team']:
-                current_home_goalies[row['game_id']] = np.nan
-            else:
-                current_away_goalies[row['game_id']] = np.nan
-        # Append the current goalie for the home and away teams to their respective lists
-        current_home_goalie_per_event.append(current_home_goalies.get(row['game_id'], None))
-        current_away_goalie_per_event.append(current_away_goalies.get(row['game_id'], None))
-
-    # Add the current goalie information as new columns to the DataFrame
-    pbp['current_home_goalie'] = current_home_goalie_per_event
-    pbp['current_away_goalie'] = current_away_goalie_per_event
+    # goalie entrances and subs put a goalie in the net for their team, pulls empty it. every event gets the
+    # last goalie set for each side earlier in the same game, None if nobody has been put in yet
+    event = pbp['event'].to_numpy()
+    name = pbp['event_primary_player_name'].to_numpy(dtype=object)
+    is_in = (event == 'goalie_entrance') | (event == 'goalie_sub')
+    is_change = is_in | (event == 'goalie_pull')
+    is_home = (pbp['event_team'] == pbp['home_team']).to_numpy()
+    game = game_keys(pbp)
+    # what each change event leaves in the net
+    in_net = np.where(is_in, name, np.nan)
+    positions = np.arange(len(pbp), dtype=float)
+    for col, side in (('current_home_goalie', is_home), ('current_away_goalie', ~is_home)):
+        # position of the latest change for this side, carried forward within each game
+        last_change = pd.Series(np.where(is_change & side, positions, np.nan), index=pbp.index)
+        last_change = last_change.groupby(game, sort=False, dropna=False).ffill().to_numpy()
+        current = np.full(len(pbp), None, dtype=object)
+        seen = ~np.isnan(last_change)
+        current[seen] = in_net[last_change[seen].astype(int)]
+        pbp[col] = current
     return pbp
 
 def add_score(pbp):
@@ -429,31 +687,77 @@ def add_score(pbp):
     pbp.loc[((pbp['is_goal']==1)&(pbp['event_team']==pbp['away_team'])&(pbp['event']!='shootout_goal')),"isAwayGoal"] = 1
     #pbp.loc[((pbp['is_goal']==1)&(pbp['event_team']==pbp['home_team'])&(pbp['event']=='shootout_goal')&(pbp['details.isGameWinningGoal']==True)),"isHomeGoal"] = 1
     #pbp.loc[((pbp['is_goal']==1)&(pbp['event_team']==pbp['away_team'])&(pbp['event']=='shootout_goal')&(pbp['details.isGameWinningGoal']==True)),"isAwayGoal"] = 1
-    pbp['away_score'] = pbp['isAwayGoal'].cumsum()
-    pbp['home_score'] = pbp['isHomeGoal'].cumsum()
+    game = game_keys(pbp)
+    pbp['away_score'] = pbp['isAwayGoal'].groupby(game, sort=False).cumsum()
+    pbp['home_score'] = pbp['isHomeGoal'].groupby(game, sort=False).cumsum()
     pbp.loc[((pbp['is_goal']==1)&(pbp['event_team']==pbp['home_team'])&(pbp['event']!='shootout_goal')),'home_score'] = pbp['home_score']-1
     pbp.loc[((pbp['is_goal']==1)&(pbp['event_team']==pbp['away_team'])&(pbp['event']!='shootout_goal')),'away_score'] = pbp['away_score']-1
-    # for shootouts
-    if "shootout_shot" in pbp['event'].value_counts().keys().tolist():
-        shootout_goals = pbp[pbp['event']=="shootout_goal"]
-        shootout_goals.groupby("event_team").count().reset_index()
-        home_team = pbp.iloc[0]['home_team']
-        away_team = pbp.iloc[0]['away_team']
+    # for shootouts, only a few games a season so one game at a time
+    for shootout_game in pd.unique(game[(pbp['event']=="shootout_shot").to_numpy()]):
+        game_pbp = pbp[game == shootout_game]
+        shootout_goals = game_pbp[game_pbp['event']=="shootout_goal"]
+        # nothing to settle yet, e.g. a live poll that only has the first shootout misses
+        if shootout_goals.empty:
+            continue
+        home_team = game_pbp.iloc[0]['home_team']
         more_goals = shootout_goals['event_team'].value_counts().sort_values().keys()[0]
+        end_of_game = (game == shootout_game) & (pbp['event']=="end_of_game").to_numpy()
         if more_goals == home_team:
-            pbp.loc[pbp['event']=="end_of_game",'home_score'] = pbp['home_score'].max()+1
+            pbp.loc[end_of_game,'home_score'] = game_pbp['home_score'].max()+1
         else:
-            pbp.loc[pbp['event']=="end_of_game",'away_score'] = pbp['away_score'].max()+1
+            pbp.loc[end_of_game,'away_score'] = game_pbp['away_score'].max()+1
     return pbp
 
 def format_pbp(pbp):
     # final cleanup of the df
     # rename some cols
-    # period
-    pbp = pbp.rename(columns={"details.period.id":"period","details.xLocation":"xC","details.yLocation":"yC","details.shotType":"shot_type","details.shotQuality":"shot_quality",
-                              "details.properties.isPowerPlay":"is_power_play","details.properties.isShortHanded":"is_short_handed","details.properties.isEmptyNet":"is_on_empty_net",
-                              "details.properties.isPenaltyShot":"is_penalty_shot","details.properties.isGameWinningGoal":"is_game_winning_goal","details.time_seconds":"game_seconds_elapsed"})
-    pbp = pbp[['game_id','game_date','home_team','home_team_id','away_team','away_team_id','period','game_seconds_elapsed','game_minutes_elapsed','event','event_team','event_primary_player_name','event_primary_player_id','event_primary_player_position','event_primary_player_sweater_number'
-               ,'event_secondary_player_name','event_secondary_player_id','event_secondary_player_position','event_secondary_player_sweater_number'
-             ,'event_tertiary_player_name','event_tertiary_player_id','event_tertiary_player_position','event_tertiary_player_sweater_number','description','shot_type','shot_quality','is_power_play','is_short_handed','is_on_empty_net','is_penalty_shot','is_game_winning_goal','xC','yC','away_score','home_score','current_home_goalie','current_away_goalie']]
+    pbp = pbp.rename(columns=OUTPUT_RENAMES)
+    pbp = pbp[OUTPUT_COLUMNS]
     return pbp
+
+def compact_pbp(pbp):
+    '''
+    compact_pbp - Function to do format_pbp's job but with a typed schema: categoricals for the repeated strings,
+                  nullable ints for ids, numbers, seconds and scores, booleans for the flags, float32 coordinates
+    parameters - pbp - a cleaned data frame (the input format_pbp would get)
+    '''
+    pbp = pbp.rename(columns=OUTPUT_RENAMES)
+    pbp = pbp[COMPACT_COLUMNS].copy()
+    return compact_dtypes(pbp)
+
+def compact_dtypes(pbp):
+    # apply COMPACT_DTYPES, also used to put categoricals back after concatenating games
+    for col, dtype in COMPACT_DTYPES.items():
+        if col not in pbp.columns or pbp[col].dtype == dtype:
+            continue
+        if dtype == 'category':
+            pbp[col] = pbp[col].astype('category')
+        elif dtype == 'boolean':
+            pbp[col] = pbp[col].map(FLAG_VALUES).astype('boolean')
+        else:
+            pbp[col] = pd.to_numeric(pbp[col], errors='coerce').astype(dtype)
+    return pbp
+
+# the stages clean_pbp runs, in order
+CLEAN_STAGES = [
+    # make sure all columns are here
+    check_columns,
+    # adding this function in to catch any weird data issues
+    check_values,
+    # clean players, to add in event players
+    clean_players,
+    # clean events
+    clean_events,
+    # clean teams
+    clean_teams,
+    # clean time
+    clean_time,
+    # add goalies
+    add_goalies,
+    # add score
+    add_score,
+    # build description
+    build_desc,
+    # format
+    format_pbp,
+]
@@ -0,0 +1,162 @@
+######################################### shots.py ##################################################
+#                                                                                                      #
+#         Shot maps, coordinates normalised to one attacking direction and binned into rink grids      #
+#                                                                                                      #
+########################################################################################################
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from .files import atomic_write
+
+# xC/yC are in the feed's rink units, 0-600 along the boards and 0-300 across
+RINK_LENGTH = 600
+RINK_WIDTH = 300
+# grid cell size in rink units, 25 gives a 24 x 12 grid
+BIN_SIZE = 25
+# the feed sends a goal as a shot and a goal, clean_events drops that shot so the goal row counts as both
+ATTEMPT_EVENTS = ['shot', 'blocked_shot', 'goal']
+SHOT_EVENTS = ['shot', 'goal']
+GOAL_EVENTS = ['goal']
+COUNTS = ['attempts', 'shots', 'goals']
+# what the grids are grouped by -> the column that is the key in the rates table
+GRID_KEYS = {'team': 'team', 'player': 'player_id', 'goalie': 'goalie'}
+
+def normalize_coordinates(pbp):
+    '''
+    normalize_coordinates - Function to turn every event's location round so the event team is attacking the
+                            x = RINK_LENGTH end. Teams switch ends every period, so the direction comes from where
+                            the team's shot attempts were in that game and period. Flipping turns the rink half way
+                            round (x and y both) so left and right stay the same from the shooter's point of view
+    returns - a copy of pbp with x_norm and y_norm columns, events from a team with no attempts that period are left as is
+    '''
+    x, y = coordinates(pbp)
+    side = attack_sides(pbp, x)
+    pbp = pbp.copy()
+    pbp['x_norm'] = np.where(side < 0, RINK_LENGTH - x, x)
+    pbp['y_norm'] = np.where(side < 0, RINK_WIDTH - y, y)
+    return pbp
+
+def shot_grids(pbp, by='team', bin_size=BIN_SIZE, cache_dir=None):
+    '''
+    shot_grids - Function to count shot attempts, shots on goal and goals in every cell of the rink for each team,
+                 shooter or goalie (the one in net for the other team) over a whole season in one pass
+    parameters - pbp - scraped games, either schema, by - 'team', 'player' or 'goalie', bin_size - cell size in rink units,
+                 cache_dir - keep the grids here as .npz, keyed on the frame's contents, and reuse them next time
+    returns - dict of numpy arrays: keys, games (games each key played), attempts/shots/goals shaped (keys, x bins, y bins)
+    '''
+    if by not in GRID_KEYS:
+        raise ValueError("by should be one of {}, not {!r}".format(list(GRID_KEYS), by))
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, 'shots-{}-{}-{}.npz'.format(by, bin_size, frame_hash(pbp)))
+        if os.path.exists(path):
+            return load_grids(path)
+
+    x, y = coordinates(pbp)
+    side = attack_sides(pbp, x)
+    x = np.where(side < 0, RINK_LENGTH - x, x)
+    y = np.where(side < 0, RINK_WIDTH - y, y)
+    event = pbp['event'].astype(object).to_numpy()
+    kinds = {'attempts': np.isin(event, ATTEMPT_EVENTS), 'shots': np.isin(event, SHOT_EVENTS), 'goals': np.isin(event, GOAL_EVENTS)}
+    entity = shot_entities(pbp, by)
+    keep = (kinds['attempts'] | kinds['goals']) & pd.notna(entity) & ~np.isnan(x) & ~np.isnan(y)
+    keys = np.unique(entity[keep].astype(np.int64 if by == 'player' else str))
+    codes = np.searchsorted(keys, entity[keep].astype(keys.dtype))
+
+    n_x, n_y = -(-RINK_LENGTH // bin_size), -(-RINK_WIDTH // bin_size)
+    x_bin = np.clip((x[keep] // bin_size).astype(np.int64), 0, n_x - 1)
+    y_bin = np.clip((y[keep] // bin_size).astype(np.int64), 0, n_y - 1)
+    # one flat index per (key, cell) so each count is a single bincount
+    cells = codes * (n_x * n_y) + x_bin * n_y + y_bin
+    grids = {'by': np.array(by), 'bin_size': np.array(bin_size), 'keys': keys, 'games': games_played(pbp, by, keys)}
+    for name in COUNTS:
+        grids[name] = np.bincount(cells[kinds[name][keep]], minlength=len(keys) * n_x * n_y).reshape(len(keys), n_x, n_y)
+
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        save_grids(grids, path)
+    return grids
+
+def shot_rates(grids):
+    '''
+    shot_rates - Function to total up shot_grids into one row per key with per game rates, shooting percentage
+                 and, for goalies, save percentage (of the shots they faced)
+    '''
+    by = str(grids['by'])
+    totals = {name: grids[name].sum(axis=(1, 2)) for name in COUNTS}
+    games = grids['games']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = pd.DataFrame({GRID_KEYS[by]: grids['keys'], 'games': games, **totals})
+        for name in COUNTS:
+            rates[name + '_per_game'] = np.where(games > 0, totals[name] / games, np.nan)
+        rates['shooting_pct'] = np.where(totals['shots'] > 0, totals['goals'] / totals['shots'], np.nan)
+        if by == 'goalie':
+            rates['save_pct'] = 1 - rates['shooting_pct']
+    return rates
+
+def save_grids(grids, path):
+    # a killed run never leaves half a cache file
+    atomic_write(path, lambda f: np.savez(f, **grids), 'wb')
+
+def load_grids(path):
+    with np.load(path) as arrays:
+        return {name: arrays[name] for name in arrays.files}
+
+def coordinates(pbp):
+    x = pd.to_numeric(pbp['xC'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    y = pd.to_numeric(pbp['yC'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    return x, y
+
+def group_codes(*cols):
+    # one code per distinct combination of the columns, without a groupby
+    codes = np.zeros(len(cols[0]), dtype=np.int64)
+    for col in cols:
+        col_codes, uniques = pd.factorize(col)
+        codes = codes * (len(uniques) + 1) + col_codes + 1
+    return pd.factorize(codes)[0]
+
+def attack_sides(pbp, x):
+    # +1 where the event team shoots at the x = RINK_LENGTH end that game and period, -1 for the other end
+    codes = group_codes(pbp['game_id'].to_numpy(), pbp['period'].to_numpy(), pbp['event_team'].astype(object).to_numpy())
+    attempts = np.isin(pbp['event'].astype(object).to_numpy(), ATTEMPT_EVENTS) & ~np.isnan(x)
+    lean = np.bincount(codes[attempts], weights=x[attempts] - RINK_LENGTH / 2, minlength=codes.max(initial=-1) + 1)
+    return np.where(lean[codes] < 0, -1, 1)
+
+def shot_entities(pbp, by):
+    # who each row's shot counts for
+    if by == 'team':
+        return pbp['event_team'].astype(object).to_numpy()
+    if by == 'player':
+        return pd.to_numeric(pbp['event_primary_player_id'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    # the goalie in net for the team that didn't shoot, NaN on an empty net
+    home = (pbp['event_team'].astype(object) == pbp['home_team'].astype(object)).to_numpy()
+    return np.where(home, pbp['current_away_goalie'].astype(object).to_numpy(), pbp['current_home_goalie'].astype(object).to_numpy())
+
+def games_played(pbp, by, keys):
+    # games each key shows up in anywhere in the frame, not just the ones they had a shot in
+    if by == 'team':
+        cols = ['home_team', 'away_team']
+    elif by == 'player':
+        cols = ['event_{}_player_id'.format(role) for role in ('primary', 'secondary', 'tertiary')]
+    else:
+        cols = ['current_home_goalie', 'current_away_goalie']
+    game_codes = pd.factorize(pbp['game_id'].to_numpy())[0]
+    n_games = game_codes.max(initial=0) + 1
+    pairs = []
+    for col in cols:
+        values = pbp[col]
+        values = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float, na_value=np.nan) if by == 'player' else values.astype(object).to_numpy()
+        found = pd.notna(values)
+        index = np.searchsorted(keys, values[found].astype(keys.dtype))
+        index = np.minimum(index, len(keys) - 1)
+        known = keys[index] == values[found].astype(keys.dtype) if len(keys) else np.zeros(found.sum(), dtype=bool)
+        pairs.append(index[known] * n_games + game_codes[found][known])
+    pairs = np.unique(np.concatenate(pairs))
+    return np.bincount(pairs // n_games, minlength=len(keys))
+
+def frame_hash(pbp):
+    # cache key, changes if any game in the frame changes
+    return hashlib.sha1(pd.util.hash_pandas_object(pbp, index=False).to_numpy().tobytes()).hexdigest()[:16]
@@ -0,0 +1,62 @@
+######################################### store.py ##################################################
+#                                                                                                      #
+#              Parquet season store, partitioned by game_season_id and game_date (needs pyarrow)       #
+#                                                                                                      #
+########################################################################################################
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # optional, only the parquet store needs it
+    pa = ds = pq = None
+
+from .scraper import COMPACT_COLUMNS, compact_dtypes
+
+PARTITION_COLS = ['game_season_id', 'game_date']
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("The parquet store needs pyarrow, install it with `pip install pyarrow`")
+
+def write_games(pbp, root):
+    '''
+    write_games - Function to add scraped games to a parquet dataset, one file per game under
+                  root/game_season_id=.../game_date=.../ so writing a game again replaces it
+    parameters - pbp - games in the compact schema (scrape_game(..., compact=True)), root - dataset directory
+    '''
+    require_pyarrow()
+    missing = set(COMPACT_COLUMNS) - set(pbp.columns)
+    if missing:
+        raise ValueError("write_games needs the compact schema, scrape with compact=True (missing {})".format(sorted(missing)))
+    for game_id, game in pbp.groupby('game_id', sort=False, observed=True):
+        table = pa.Table.from_pandas(game, preserve_index=False)
+        pq.write_to_dataset(
+            table, root, partition_cols=PARTITION_COLS,
+            basename_template='game-{}-{{i}}.parquet'.format(game_id),
+            existing_data_behavior='overwrite_or_ignore',
+        )
+
+def read_games(root, season_id=None, game_ids=None, columns=None):
+    '''
+    read_games - Function to load games back from the parquet dataset as one columnar read
+    parameters - root - dataset directory, season_id - only this season, game_ids - only these games,
+                 columns - only these columns
+    '''
+    require_pyarrow()
+    dataset = ds.dataset(root, format='parquet', partitioning=ds.partitioning(
+        pa.schema([('game_season_id', pa.int16()), ('game_date', pa.string())]), flavor='hive'))
+    condition = None
+    if season_id is not None:
+        condition = ds.field('game_season_id') == int(season_id)
+    if game_ids is not None:
+        in_games = ds.field('game_id').isin([int(game_id) for game_id in game_ids])
+        condition = in_games if condition is None else condition & in_games
+    pbp = dataset.to_table(columns=columns, filter=condition).to_pandas()
+    # categories are per file, unify them again
+    pbp = compact_dtypes(pbp)
+    if columns is None:
+        pbp = pbp[COMPACT_COLUMNS]
+    # each game is one file in event order, so only the games need putting in order
+    if 'game_id' in pbp.columns:
+        pbp = pbp.sort_values('game_id', kind='stable').reset_index(drop=True)
+    return pbp
@@ -0,0 +1,112 @@
+######################################### stream.py #################################################
+#                                                                                                      #
+#              Live games, polls the feeds and only cleans the events that are new since last poll     #
+#                                                                                                      #
+########################################################################################################
+import time
+
+import numpy as np
+import requests
+
+from .scraper import (CLEAN_STAGES, add_goalies, add_header_trailer, add_misc_info, add_score, build_events,
+                      build_game, compact_pbp, extract_json, fetch_feed, format_pbp, game_is_final,
+                      normalize_period_columns)
+
+def new_stream_state():
+    # what the cumulative stages need to know about the events already cleaned
+    return {
+        'events': 0,                        # raw events already cleaned
+        'home_score': 0, 'away_score': 0,   # add_score running totals
+        'home_goalie': None, 'away_goalie': None,  # add_goalies, None until a goalie comes in
+        'shot_type': np.nan, 'shot_quality': np.nan,  # last raw event, clean_events gives goals the shot before them
+        'last_row': -1,                     # index of the last row yielded
+    }
+
+def clean_new_events(pbp_json, misc_text, state, compact=False):
+    '''
+    clean_new_events - Function to clean only the events appended since the last call, carrying the
+                       score, goalies in net and the goal/shot shift forward in state
+                       The rows come out the same (values and index) as they are in a full clean of the game
+    parameters - pbp_json - the whole decoded play-by-play feed, misc_text - the gameSummary feed,
+                 state - from new_stream_state, updated in place, compact - use compact_pbp's schema
+    '''
+    new = build_events(pbp_json[state['events']:])
+    new = normalize_period_columns(new)
+    # a field nobody in this batch has comes out float, over a whole game it would mostly hold strings
+    empty = new.columns[new.isna().all().to_numpy()]
+    new[empty] = new[empty].astype(object)
+    shot_type = new['details.shotType'].iloc[-1]
+    shot_quality = new['details.shotQuality'].iloc[-1]
+    # the header and trailer rows keep every column typed like it is for the whole game, they're dropped at the end
+    pbp = add_header_trailer(new)
+    # the goal after a shot at the very start of this batch takes its type from the last batch
+    for col, key in (('details.shotType', 'shot_type'), ('details.shotQuality', 'shot_quality')):
+        if isinstance(state[key], str):
+            pbp[col] = pbp[col].astype(object)
+            pbp.iloc[0, pbp.columns.get_loc(col)] = state[key]
+    pbp = add_misc_info(pbp, None, misc_text)
+    for stage in CLEAN_STAGES:
+        if compact and stage is format_pbp:
+            stage = compact_pbp
+        pbp = stage(pbp)
+        if stage is add_goalies:
+            # rows before this batch's first goalie change still have whoever was in net last batch
+            for col, key in (('current_home_goalie', 'home_goalie'), ('current_away_goalie', 'away_goalie')):
+                values = pbp[col].to_numpy()
+                unseen = np.array([value is None for value in values])
+                values[unseen] = state[key]
+                pbp[col] = values
+                state[key] = values[-2]
+        elif stage is add_score:
+            pbp['home_score'] += state['home_score']
+            pbp['away_score'] += state['away_score']
+            state['home_score'] += int(pbp['isHomeGoal'].iloc[1:-1].sum())
+            state['away_score'] += int(pbp['isAwayGoal'].iloc[1:-1].sum())
+    # the header is the real start_of_game row on the first batch
+    pbp = pbp.iloc[0 if state['events'] == 0 else 1:-1]
+    # number the rows the way the full game does, header is row 0
+    pbp.index = pbp.index + state['events']
+    state['events'] = len(pbp_json)
+    state['shot_type'] = shot_type
+    state['shot_quality'] = shot_quality
+    if len(pbp):
+        state['last_row'] = pbp.index[-1]
+    return pbp
+
+def stream_game(game_id, interval=30, session=None, compact=False, max_polls=None):
+    '''
+    stream_game - Generator to follow a live game. Both feeds are polled every interval seconds and only the
+                  events added since the last poll get cleaned, so a poll late in the game costs about the same
+                  as one early on. When the game goes final it's cleaned once in full for the end_of_game row
+    parameters - game_id - the game to follow, interval - seconds between polls, session - requests session,
+                 compact - yield compact_pbp's schema, max_polls - give up after this many polls
+    yields - a data frame of the new cleaned rows, every poll that has any
+    '''
+    state = new_stream_state()
+    polls = 0
+    pbp_text = None
+    while max_polls is None or polls < max_polls:
+        if polls:
+            time.sleep(interval)
+        polls += 1
+        try:
+            new_text = fetch_feed('gameCenterPlayByPlay', game_id, session)
+            misc_text = fetch_feed('gameSummary', game_id, session)
+        except requests.exceptions.RequestException as req_exc:
+            # a live game shouldn't stop over one bad poll
+            print(f"Game {game_id} poll failed: {req_exc}")
+            continue
+        if game_is_final(misc_text):
+            pbp = build_game(game_id, new_text, misc_text, compact)
+            pbp = pbp[pbp.index > state['last_row']]
+            if len(pbp):
+                yield pbp
+            return
+        if new_text == pbp_text:
+            continue
+        pbp_text = new_text
+        pbp_json = extract_json(pbp_text)
+        if len(pbp_json) > state['events']:
+            pbp = clean_new_events(pbp_json, misc_text, state, compact)
+            if len(pbp):
+                yield pbp
@@ -0,0 +1,138 @@
+######################################### sync.py ###################################################
+#                                                                                                      #
+#                Incremental season sync, only rescrapes games that are new or still changing          #
+#                                                                                                      #
+########################################################################################################
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .feeds import extract_json, fetch_feed, game_is_final
+from .files import atomic_write
+
+def load_manifest(path):
+    # {"games": {"<game_id>": {"final": bool, "pbp_hash": str, "summary_hash": str, "synced_at": float}}}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'games': {}}
+
+def save_manifest(manifest, path):
+    # an interrupted sync never leaves half a manifest
+    atomic_write(path, lambda f: json.dump(manifest, f, indent=1, sort_keys=True))
+
+def content_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def sync_game(game_id, entry=None, cache=None, compact=True, session=None, observer=None):
+    '''
+    sync_game - Function to check one game against its manifest entry
+    parameters - game_id - the game, entry - its manifest entry if we've seen it before,
+                 cache - optional FeedCache, compact - clean into the compact schema, observer - see metrics.py
+    returns - (new entry, frame), (None, None) if the game doesn't exist (yet), frame is None if nothing changed
+              raises if the request failed for any other reason, so a game is only missing when the api says so
+    '''
+    try:
+        pbp_text = fetch_feed('gameCenterPlayByPlay', game_id, session, cache, observer=observer)
+    except requests.exceptions.HTTPError as exc:
+        # a 429/5xx that outlasted the retries says nothing about whether the game exists
+        if getattr(exc.response, 'status_code', None) != 404:
+            raise
+        return None, None
+    if len(extract_json(pbp_text)) == 0:
+        return None, None
+    # only ask for the summary once we know the game is there
+    misc_text = fetch_feed('gameSummary', game_id, session, cache, observer=observer)
+    new_entry = {
+        'final': game_is_final(misc_text),
+        'pbp_hash': content_hash(pbp_text),
+        'summary_hash': content_hash(misc_text),
+        'synced_at': time.time(),
+    }
+    if entry is not None and entry['pbp_hash'] == new_entry['pbp_hash'] and entry['summary_hash'] == new_entry['summary_hash']:
+        return new_entry, None
+    # pandas only gets loaded once there's a game to clean, a sync with nothing new never needs it
+    from .scraper import build_game
+    return new_entry, build_game(game_id, pbp_text, misc_text, compact, observer)
+
+def sync_games(manifest_path, first_game_id=1, store_root=None, cache=None, max_workers=8, stop_after=3, compact=True, session=None,
+               observer=None, max_failures=3):
+    '''
+    sync_games - Function to bring a season up to date. Games the manifest has as final are never requested again,
+                 known games that weren't final are rechecked, and new ids are probed upwards from first_game_id
+                 until stop_after games in a row past the last known game don't exist
+    parameters - manifest_path - json manifest of game_id, final status and content hashes (created if missing),
+                 first_game_id - lowest game id to consider, store_root - also write changed games to this parquet
+                 store (see store.py, needs compact), cache - optional FeedCache, max_workers - parallel requests,
+                 stop_after - missing games in a row that mean the schedule has run out, compact - compact schema,
+                 session - one session shared by every worker, defaults to a pooled session per thread,
+                 observer - optional callback for metrics (see metrics.py),
+                 max_failures - failed probes in a row that stop the search for new games (e.g. the network is down)
+    returns - (games, failures), games maps every game id whose payload changed to its cleaned frame
+    '''
+    manifest = load_manifest(manifest_path)
+    entries = manifest['games']
+    known = {int(game_id) for game_id in entries}
+    last_known = max(known, default=first_game_id - 1)
+    games = {}
+    failures = {}
+
+    def run_batch(pool, batch):
+        # returns which games in the batch exist, in order, None for the ones that failed
+        found = []
+        futures = [pool.submit(sync_game, game_id, entries.get(str(game_id)), cache, compact, session, observer) for game_id in batch]
+        for game_id, future in zip(batch, futures):
+            try:
+                entry, pbp = future.result()
+            except Exception as exc:
+                failures[game_id] = exc
+                if observer is not None:
+                    observer('failures', 1, stage='sync', error=type(exc).__name__)
+                found.append(None)
+                continue
+            found.append(entry is not None)
+            if entry is None:
+                continue
+            entries[str(game_id)] = entry
+            if pbp is not None:
+                games[game_id] = pbp
+                if store_root is not None:
+                    from .store import write_games
+                    write_games(pbp, store_root)
+        save_manifest(manifest, manifest_path)
+        return found
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # games we already know about that weren't over yet
+        unfinished = sorted(game_id for game_id in known if game_id >= first_game_id and not entries[str(game_id)]['final'])
+        for i in range(0, len(unfinished), max_workers):
+            run_batch(pool, unfinished[i:i + max_workers])
+        # then new games, until the schedule runs out
+        game_id = first_game_id
+        misses = 0
+        failed = 0
+        while misses < stop_after and failed < max_failures:
+            batch = []
+            while len(batch) < max_workers:
+                if game_id not in known:
+                    batch.append(game_id)
+                game_id += 1
+            for probed, exists in zip(batch, run_batch(pool, batch)):
+                # a failed request tells us nothing either way, it neither resets nor adds to the misses
+                if exists is None:
+                    failed += 1
+                    if failed >= max_failures:
+                        break
+                    continue
+                failed = 0
+                if exists:
+                    misses = 0
+                elif probed > last_known:
+                    misses += 1
+                if misses >= stop_after:
+                    break
+    return games, failures
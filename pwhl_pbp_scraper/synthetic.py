@@ -0,0 +1,187 @@
+######################################### synthetic.py ##############################################
+#                                                                                                      #
+#                      Synthetic HockeyTech gameCenterPlayByPlay / gameSummary feeds                   #
+#                                                                                                      #
+########################################################################################################
+import json
+import random
+
+SHOT_TYPES = ['Default', 'Wrist', 'Slapshot', 'Snapshot', 'Backhand', 'Tip-in']
+SHOT_QUALITIES = ['Quality on net', 'Non quality on net', 'Quality goal', 'Non quality goal']
+PENALTIES = ['Tripping', 'Hooking', 'Slashing', 'Interference', 'Roughing', 'Holding']
+TEAMS = [(1, 'BOS'), (2, 'MIN'), (3, 'MTL'), (4, 'NY'), (5, 'OTT'), (6, 'TOR')]
+
+def generate_game(game_id, seed=None, events_per_period=80, overtime=False, shootout=False,
+                  penalty_shots=1, goalie_pulls=True, season_id=1, final=True):
+    '''
+    generate_game - Function to build a synthetic game in the shape of the HockeyTech feeds
+    parameters - game_id - the id to stamp on the game, seed - random seed (defaults to game_id),
+                 events_per_period - roughly how many events to emit in each regulation period,
+                 overtime/shootout - add an OT period / a shootout, penalty_shots - number of penalty shots,
+                 goalie_pulls - pull the trailing team's goalie late in the 3rd, final - mark the game final
+    returns - (pbp_json, summary_json), the decoded bodies of the two feeds
+    '''
+    rng = random.Random(game_id if seed is None else seed)
+    home, away = rng.sample(TEAMS, 2)
+    rosters = {home[0]: _roster(rng, home[0]), away[0]: _roster(rng, away[0])}
+    starters = {team_id: rosters[team_id]['goalies'][0] for team_id in rosters}
+    in_net = {}
+    score = {home[0]: 0, away[0]: 0}
+    events = []
+
+    def period(pid):
+        names = {'1': '1st', '2': '2nd', '3': '3rd', '4': 'OT1', '5': 'SO'}
+        return {'id': pid, 'shortName': names.get(pid, pid), 'longName': names.get(pid, pid)}
+
+    def goalie_for(team_id):
+        return in_net.get(team_id)
+
+    # goalies enter at the start of the game
+    for team_id in (home[0], away[0]):
+        in_net[team_id] = starters[team_id]
+        events.append({'event': 'goalie_change', 'details': {
+            'time': '0:00', 'period': period('1'), 'goalieComingIn': dict(starters[team_id]),
+            'goalieGoingOut': None, 'team_id': str(team_id)}})
+
+    periods = ['1', '2', '3'] + (['4'] if overtime or shootout else [])
+    shots_left = penalty_shots
+    for pid in periods:
+        length = 300 if pid == '4' else 1200
+        n_events = events_per_period // 4 if pid == '4' else events_per_period
+        times = sorted(rng.randint(0, length - 1) for _ in range(n_events))
+        pulled = None
+        for i, sec in enumerate(times):
+            clock = '{}:{:02d}'.format(sec // 60, sec % 60)
+            # pull the trailing team's goalie late in the 3rd
+            if goalie_pulls and pid == '3' and pulled is None and sec > 1080 and score[home[0]] != score[away[0]]:
+                pulled = home[0] if score[home[0]] < score[away[0]] else away[0]
+                events.append({'event': 'goalie_change', 'details': {
+                    'time': clock, 'period': period(pid), 'goalieComingIn': None,
+                    'goalieGoingOut': dict(in_net[pulled]), 'team_id': str(pulled)}})
+                in_net[pulled] = None
+                continue
+            team_id = rng.choice((home[0], away[0]))
+            other = away[0] if team_id == home[0] else home[0]
+            kind = rng.choices(['faceoff', 'shot', 'blocked_shot', 'hit', 'penalty', 'goal', 'sub', 'penaltyshot'],
+                               weights=[25, 30, 12, 15, 6, 5, 1, 2])[0]
+            base = {'time': clock, 'period': period(pid)}
+            x, y = rng.randint(0, 600), rng.randint(0, 300)
+            if kind == 'faceoff':
+                events.append({'event': 'faceoff', 'details': dict(base, **{
+                    'homePlayer': _skater(rng, rosters[home[0]]), 'visitingPlayer': _skater(rng, rosters[away[0]]),
+                    'homeWin': rng.choice(['1', '0']), 'xLocation': x, 'yLocation': y})})
+            elif kind == 'shot':
+                events.append({'event': 'shot', 'details': dict(base, **{
+                    'shooter': _skater(rng, rosters[team_id]), 'goalie': _goalie_obj(goalie_for(other)),
+                    'shooterTeamId': str(team_id), 'xLocation': x, 'yLocation': y,
+                    'shotType': rng.choice(SHOT_TYPES), 'shotQuality': rng.choice(SHOT_QUALITIES[:2]),
+                    'isGoal': False})})
+            elif kind == 'blocked_shot':
+                events.append({'event': 'blocked_shot', 'details': dict(base, **{
+                    'shooter': _skater(rng, rosters[team_id]), 'blocker': _skater(rng, rosters[other]),
+                    'shooterTeamId': str(team_id), 'blockerTeamId': str(other), 'xLocation': x, 'yLocation': y})})
+            elif kind == 'hit':
+                events.append({'event': 'hit', 'details': dict(base, **{
+                    'player': _skater(rng, rosters[team_id]), 'teamId': str(team_id), 'xLocation': x, 'yLocation': y})})
+            elif kind == 'penalty':
+                taker = _skater(rng, rosters[team_id])
+                events.append({'event': 'penalty', 'details': dict(base, **{
+                    'againstTeam': {'id': team_id, 'name': '', 'abbreviation': ''},
+                    'minutes': rng.choice(['2.00', '2.00', '4.00', '5.00']), 'description': rng.choice(PENALTIES),
+                    'takenBy': taker, 'servedBy': taker, 'isPowerPlay': True, 'isBench': False})})
+            elif kind == 'goal':
+                scorer = _skater(rng, rosters[team_id])
+                n_assists = rng.choice([0, 1, 2, 2, 2])
+                assists = [_skater(rng, rosters[team_id]) for _ in range(n_assists)]
+                shot_type = rng.choice(SHOT_TYPES)
+                events.append({'event': 'shot', 'details': dict(base, **{
+                    'shooter': scorer, 'goalie': _goalie_obj(goalie_for(other)), 'shooterTeamId': str(team_id),
+                    'xLocation': x, 'yLocation': y, 'shotType': shot_type,
+                    'shotQuality': rng.choice(SHOT_QUALITIES[2:]), 'isGoal': True})})
+                score[team_id] += 1
+                events.append({'event': 'goal', 'details': dict(base, **{
+                    'team': {'id': team_id, 'name': '', 'abbreviation': ''},
+                    'xLocation': x, 'yLocation': y, 'scoredBy': scorer, 'assists': assists,
+                    'assistNumbers': [None] * n_assists,
+                    'properties': {'isPowerPlay': rng.choice(['0', '0', '1']), 'isShortHanded': rng.choice(['0', '0', '0', '1']),
+                                   'isEmptyNet': '1' if goalie_for(other) is None else '0', 'isPenaltyShot': '0',
+                                   'isInsuranceGoal': '0', 'isGameWinningGoal': '0'},
+                    'plus_players': [], 'minus_players': []})})
+            elif kind == 'sub' and in_net.get(team_id) is not None:
+                backup = rosters[team_id]['goalies'][1] if in_net[team_id] is rosters[team_id]['goalies'][0] else rosters[team_id]['goalies'][0]
+                events.append({'event': 'goalie_change', 'details': dict(base, **{
+                    'goalieComingIn': dict(backup), 'goalieGoingOut': dict(in_net[team_id]), 'team_id': str(team_id)})})
+                in_net[team_id] = backup
+            elif kind == 'penaltyshot' and shots_left > 0:
+                shots_left -= 1
+                is_goal = rng.random() < 0.3
+                events.append({'event': 'penaltyshot', 'details': dict(base, **{
+                    'shooter': _skater(rng, rosters[team_id]), 'goalie': _goalie_obj(goalie_for(other)),
+                    'shooter_team': {'id': team_id}, 'isGoal': is_goal})})
+        # the pulled goalie comes back for the next period
+        if pulled is not None:
+            in_net[pulled] = starters[pulled]
+            events.append({'event': 'goalie_change', 'details': {
+                'time': '{}:{:02d}'.format(length // 60, 0), 'period': period(pid),
+                'goalieComingIn': dict(starters[pulled]), 'goalieGoingOut': None, 'team_id': str(pulled)}})
+
+    if shootout:
+        winner = None
+        made = {home[0]: 0, away[0]: 0}
+        for rnd in range(rng.randint(3, 6)):
+            for team_id in (away[0], home[0]):
+                other = away[0] if team_id == home[0] else home[0]
+                is_goal = rng.random() < 0.35
+                made[team_id] += int(is_goal)
+                events.append({'event': 'shootout', 'details': {
+                    'shooter': _skater(rng, rosters[team_id]), 'goalie': _goalie_obj(starters[other]),
+                    'shooterTeam': {'id': team_id}, 'isGoal': is_goal, 'isGameWinningGoal': False}})
+        # make sure somebody wins it
+        if made[home[0]] == made[away[0]]:
+            winner = rng.choice((home[0], away[0]))
+            other = away[0] if winner == home[0] else home[0]
+            events.append({'event': 'shootout', 'details': {
+                'shooter': _skater(rng, rosters[winner]), 'goalie': _goalie_obj(starters[other]),
+                'shooterTeam': {'id': winner}, 'isGoal': True, 'isGameWinningGoal': True}})
+
+    summary = {
+        'details': {'id': str(game_id), 'date': '', 'GameDateISO8601': '2024-0{}-{:02d}T19:00:00-05:00'.format(1 + game_id % 5, 1 + game_id % 28),
+                    'seasonId': str(season_id), 'status': 'Final' if final else 'In Progress', 'final': '1' if final else '0'},
+        'homeTeam': {'info': {'id': home[0], 'name': home[1], 'abbreviation': home[1]},
+                     'skaters': [{'info': dict(p)} for p in rosters[home[0]]['skaters']],
+                     'goalies': [{'info': dict(p)} for p in rosters[home[0]]['goalies']]},
+        'visitingTeam': {'info': {'id': away[0], 'name': away[1], 'abbreviation': away[1]},
+                         'skaters': [{'info': dict(p)} for p in rosters[away[0]]['skaters']],
+                         'goalies': [{'info': dict(p)} for p in rosters[away[0]]['goalies']]},
+    }
+    return events, summary
+
+def game_feeds(game_id, events_per_period=80):
+    '''
+    game_feeds - Function to build a game from the usual mix of regulation, OT and shootout games with penalty
+                 shots and goalie pulls, picked from the game_id so the same id is always the same game
+    returns - (pbp_text, summary_text), JSONP like the api sends
+    '''
+    pbp_json, misc_json = generate_game(
+        game_id, events_per_period=events_per_period, overtime=game_id % 4 == 0, shootout=game_id % 5 == 0,
+        penalty_shots=game_id % 3, goalie_pulls=game_id % 2 == 0)
+    return to_jsonp(pbp_json), to_jsonp(misc_json, 'angular.callbacks._6')
+
+def to_jsonp(payload, callback='angular.callbacks._8'):
+    # wrap a decoded feed back up the way the api sends it
+    return '{}({});'.format(callback, json.dumps(payload))
+
+def _roster(rng, team_id):
+    skaters = [_player(team_id * 100 + i, rng.choice(['F', 'F', 'D'])) for i in range(1, 19)]
+    goalies = [_player(team_id * 100 + i, 'G') for i in (30, 31)]
+    return {'skaters': skaters, 'goalies': goalies}
+
+def _player(player_id, position):
+    return {'id': player_id, 'firstName': 'First{}'.format(player_id), 'lastName': 'Last{}'.format(player_id),
+            'jerseyNumber': player_id % 100, 'position': position, 'birthDate': '2000-01-01', 'playerImageURL': ''}
+
+def _skater(rng, roster):
+    return dict(rng.choice(roster['skaters']))
+
+def _goalie_obj(goalie):
+    return dict(goalie) if goalie is not None else None
@@ -0,0 +1,160 @@
+######################################### transport.py ##############################################
+#                                                                                                      #
+#        HTTP transport for the feeds, timeouts, retries with backoff, rate limit, adaptive concurrency #
+#                                                                                                      #
+########################################################################################################
+import random
+import threading
+import time
+
+import requests
+
+# (connect, read) seconds, a stalled connection fails instead of hanging a backfill
+TIMEOUT = (3.05, 15)
+# responses worth trying again, everything else (404 for a game that doesn't exist) is final
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    '''
+    TokenBucket - Limits requests to rate per second on average, with bursts of up to burst requests
+    '''
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        # take a token if there is one and return 0, otherwise return how long until there will be
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class AdaptiveLimit:
+    '''
+    AdaptiveLimit - Caps how many requests are in flight at once. The cap grows by about one for every
+    limit requests that come back clean and faster than target_latency, and halves when one errors or is
+    slow (at most once per cooldown seconds, so a burst of failures doesn't take it straight to minimum)
+    '''
+    def __init__(self, initial=4, minimum=1, maximum=16, target_latency=2.0, cooldown=1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency, ok):
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if ok and latency <= self.target_latency:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif now - self._last_decrease >= self.cooldown:
+                self.limit = max(self.minimum, self.limit / 2)
+                self._last_decrease = now
+            self._cond.notify_all()
+
+
+class Transport:
+    '''
+    Transport - Every feed request goes through one of these (see fetch_feed). Requests get connect/read
+    timeouts, connection errors, timeouts and 429/5xx responses are retried with jittered exponential backoff
+    (honouring Retry-After), a token bucket keeps the request rate under rate per second and an AdaptiveLimit
+    sets how many can be in flight from the latency and errors it sees
+    parameters - session - requests session to send with, defaults to the caller's, timeout - (connect, read),
+                 retries - extra attempts per request, backoff/max_backoff - first and largest retry delay,
+                 rate/burst - token bucket (rate=None for no limit), concurrency/max_concurrency - starting
+                 and largest number of requests in flight, target_latency - slower responses shrink concurrency
+    '''
+    def __init__(self, session=None, timeout=TIMEOUT, retries=4, backoff=0.5, max_backoff=30, rate=20, burst=40,
+                 concurrency=4, max_concurrency=16, target_latency=2.0):
+        self.session = session
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.limit = AdaptiveLimit(concurrency, 1, max_concurrency, target_latency)
+        self.stats = {'requests': 0, 'retries': 0, 'errors': 0}
+        self._lock = threading.Lock()
+
+    def get(self, url, session=None):
+        '''
+        get - Function to GET a url with retries. Returns the response, which is a failed one if every retry
+              of a 429/5xx failed too, and raises the last error if the connection kept failing
+        '''
+        session = session or self.session
+        for attempt in range(self.retries + 1):
+            if self.bucket is not None:
+                self.bucket.acquire()
+            self.limit.acquire()
+            start = time.monotonic()
+            resp = None
+            ok = False
+            try:
+                resp = session.get(url, timeout=self.timeout)
+                ok = resp.status_code not in RETRY_STATUSES
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exc:
+                error = exc
+            finally:
+                self.limit.release(time.monotonic() - start, ok)
+                self._count('requests')
+            if ok:
+                return resp
+            self._count('errors')
+            if attempt == self.retries:
+                break
+            self._count('retries')
+            time.sleep(self.delay(attempt, resp))
+        if resp is not None:
+            return resp
+        raise error
+
+    def delay(self, attempt, resp=None):
+        # full jitter, anywhere up to backoff * 2^attempt, but never sooner than the server asked for
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        retry_after = getattr(resp, 'headers', {}).get('Retry-After') if resp is not None else None
+        if retry_after is not None and retry_after.isdigit():
+            delay = max(delay, min(self.max_backoff, int(retry_after)))
+        return delay
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+
+_transport = Transport()
+
+def get_transport():
+    # the transport fetch_feed uses unless it's handed one
+    return _transport
+
+def set_transport(transport):
+    '''
+    set_transport - Function to replace the transport every fetch goes through, e.g. set_transport(Transport(rate=5))
+    '''
+    global _transport
+    _transport = transport
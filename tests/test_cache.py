@@ -0,0 +1,58 @@
+import contextlib
+import io
+
+import pytest
+
+from pwhl_pbp_scraper import feeds, scraper
+from pwhl_pbp_scraper.cache import FeedCache, FileCache, SQLiteCache
+from pwhl_pbp_scraper.mock_server import start_mock_server
+from pwhl_pbp_scraper.transport import Transport, get_transport, set_transport
+
+@pytest.fixture
+def server():
+    server = start_mock_server(games=12, events_per_period=20)
+    old_transport = get_transport()
+    feeds.set_base_url(server.url)
+    set_transport(Transport(rate=None, retries=0))
+    yield server
+    feeds.set_base_url()
+    set_transport(old_transport)
+    server.stop()
+
+@pytest.fixture(params=['file', 'sqlite'])
+def make_cache(request, tmp_path):
+    if request.param == 'file':
+        return lambda ttl: FileCache(str(tmp_path / 'cache'), ttl=ttl)
+    return lambda ttl: SQLiteCache(str(tmp_path / 'cache.db'), ttl=ttl)
+
+def test_finished_games_are_cached_for_good(server, make_cache):
+    cache = make_cache(300)
+    with contextlib.redirect_stdout(io.StringIO()):
+        games, failures = scraper.scrape_games(range(1, 11), cache=cache)
+        scraper.scrape_game(11, cache=cache)
+    assert not failures
+    # both feeds of every finished game are final, whichever response was stored first
+    for view in ('gameCenterPlayByPlay', 'gameSummary'):
+        assert all(cache._read(view, game_id)[1] for game_id in range(1, 12)), view
+    # so with everything expired, nothing gets asked for again
+    requests = server.snapshot()['requests']
+    expired = make_cache(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        again, failures = scraper.scrape_games(range(1, 12), cache=expired)
+    assert not failures
+    assert server.snapshot()['requests'] == requests
+    assert again.iloc[:len(games)].equals(games)
+
+def test_backends_must_implement_everything():
+    class Partial(FeedCache):
+        def game_ids(self, view):
+            return []
+
+        def _read(self, view, game_id):
+            return None
+
+        def _write(self, view, game_id, text, final):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial()
@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+from pwhl_pbp_scraper.files import atomic_write
+
+def test_atomic_write_replaces_the_file(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    atomic_write(path, lambda f: f.write('old'))
+    atomic_write(path, lambda f: f.write(b'new'), 'wb')
+    with open(path) as f:
+        assert f.read() == 'new'
+    assert os.listdir(str(tmp_path)) == ['checkpoint.json']
+
+def test_failed_write_leaves_the_old_file(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    atomic_write(path, lambda f: f.write('old'))
+
+    def write(f):
+        f.write('half')
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        atomic_write(path, write)
+    with open(path) as f:
+        assert f.read() == 'old'
+    assert os.listdir(str(tmp_path)) == ['checkpoint.json']
@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+from pwhl_pbp_scraper import scraper, synthetic
+
+# regulation, penalty shots, goalie pulls, overtime and shootouts, on their own and together
+GAME_IDS = [1, 2, 3, 4, 5, 6, 10, 12, 20, 60]
+
+def game_feeds(game_id):
+    events, summary = synthetic.generate_game(game_id, overtime=game_id % 4 == 0, shootout=game_id % 5 == 0,
+                                              penalty_shots=game_id % 3, goalie_pulls=game_id % 2 == 0)
+    return synthetic.to_jsonp(events), synthetic.to_jsonp(summary, 'angular.callbacks._6')
+
+def old_clean(game_id, pbp_text, misc_text, compact=False):
+    # how scrape_game used to build the raw frame, json_normalize then clean_players pulling the assists out
+    pbp = pd.json_normalize(scraper.extract_json(pbp_text))
+    pbp = scraper.normalize_period_columns(pbp)
+    assert not pbp.columns.str.startswith('assistor_').any()
+    pbp = scraper.add_misc_info(pbp, game_id, misc_text)
+    return scraper.clean_games(pbp, compact)
+
+@pytest.mark.parametrize('compact', [False, True])
+@pytest.mark.parametrize('game_id', GAME_IDS)
+def test_build_game_matches_json_normalize(game_id, compact):
+    pbp_text, misc_text = game_feeds(game_id)
+    pd.testing.assert_frame_equal(scraper.build_game(game_id, pbp_text, misc_text, compact),
+                                  old_clean(game_id, pbp_text, misc_text, compact))
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_combined_clean_matches_games_cleaned_one_by_one(monkeypatch, compact):
+    feeds = {game_id: game_feeds(game_id) for game_id in GAME_IDS}
+    monkeypatch.setattr(scraper, 'fetch_feed', lambda view, game_id, *args, **kwargs:
+                        feeds[game_id][view == 'gameSummary'])
+    games, failures = scraper.scrape_games(GAME_IDS, max_workers=2, compact=compact)
+    assert not failures
+    one_by_one = pd.concat([scraper.build_game(game_id, *feeds[game_id], compact) for game_id in GAME_IDS], ignore_index=True)
+    if compact:
+        one_by_one = scraper.compact_dtypes(one_by_one)
+    pd.testing.assert_frame_equal(games, one_by_one)
@@ -0,0 +1,43 @@
+import contextlib
+import io
+import warnings
+
+import pandas as pd
+import pytest
+
+from pwhl_pbp_scraper import scraper, stream, synthetic
+
+# regulation only, penalty shots with goalie pulls, overtime, a shootout, and everything at once
+GAME_IDS = [3, 2, 4, 5, 20]
+
+def game_events(game_id, final=True):
+    return synthetic.generate_game(game_id, overtime=game_id % 4 == 0, shootout=game_id % 5 == 0,
+                                   penalty_shots=game_id % 3, goalie_pulls=game_id % 2 == 0, final=final)
+
+def streamed(monkeypatch, game_id, cuts, compact):
+    # play the game's events out over polls of the given lengths, then the final summary
+    events, final_summary = game_events(game_id)
+    live_summary = game_events(game_id, final=False)[1]
+    bodies = []
+    for cut in cuts:
+        bodies += [synthetic.to_jsonp(events[:cut]), synthetic.to_jsonp(live_summary, 'angular.callbacks._6')]
+    bodies += [synthetic.to_jsonp(events), synthetic.to_jsonp(final_summary, 'angular.callbacks._6')]
+    replies = iter(bodies)
+    monkeypatch.setattr(stream, 'fetch_feed', lambda view, game_id, session=None: next(replies))
+    with contextlib.redirect_stdout(io.StringIO()):
+        batches = list(stream.stream_game(game_id, interval=0, compact=compact))
+        full = scraper.build_game(game_id, bodies[-2], bodies[-1], compact)
+    with warnings.catch_warnings():
+        # a batch with an all-NA column (no goalie pull yet, say) warns about how concat picks dtypes
+        warnings.simplefilter('ignore', FutureWarning)
+        got = pd.concat(batches)
+    return scraper.compact_dtypes(got) if compact else got, full
+
+@pytest.mark.parametrize('compact', [False, True])
+@pytest.mark.parametrize('game_id', GAME_IDS)
+def test_stream_matches_full_clean(monkeypatch, game_id, compact):
+    n_events = len(game_events(game_id)[0])
+    # a poll every 60 events, then one event at a time through the end of the game so a poll lands in the shootout
+    cuts = list(range(1, n_events - 12, 60)) + list(range(n_events - 12, n_events + 1))
+    got, full = streamed(monkeypatch, game_id, cuts, compact)
+    pd.testing.assert_frame_equal(got, full, check_dtype=compact)
@@ -0,0 +1,151 @@
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+from pwhl_pbp_scraper import mock_server
+from pwhl_pbp_scraper.feeds import FEED_PATHS
+from pwhl_pbp_scraper.mock_server import start_mock_server
+from pwhl_pbp_scraper.transport import AdaptiveLimit, TokenBucket, Transport
+
+@pytest.fixture
+def session():
+    with requests.Session() as session:
+        yield session
+
+def feed_url(server, game_id=1):
+    return server.url + FEED_PATHS['gameSummary'].format(game_id)
+
+def test_retries_5xx_until_it_succeeds(monkeypatch, session):
+    server = start_mock_server(games=1, events_per_period=10, error_rate=0.5)
+    # the server's error draws, the first two requests fail and the third gets through
+    draws = iter([0.0, 0.0, 0.9])
+    monkeypatch.setattr(mock_server.random, 'random', lambda: next(draws))
+    transport = Transport(session=session, rate=None, retries=3, backoff=0)
+    try:
+        resp = transport.get(feed_url(server))
+        stats = server.snapshot()
+    finally:
+        server.stop()
+    assert resp.status_code == 200
+    assert sum(stats['statuses'].get(status, 0) for status in ('500', '502', '503')) == 2
+    assert transport.stats == {'requests': 3, 'retries': 2, 'errors': 2}
+
+def test_gives_back_the_last_5xx_when_retries_run_out(session):
+    server = start_mock_server(games=1, events_per_period=10, error_rate=1.0)
+    transport = Transport(session=session, rate=None, retries=2, backoff=0)
+    try:
+        resp = transport.get(feed_url(server))
+    finally:
+        server.stop()
+    assert resp.status_code in mock_server.ERROR_STATUSES
+    assert transport.stats == {'requests': 3, 'retries': 2, 'errors': 3}
+
+def test_waits_out_retry_after_on_429(session):
+    # one request a second, so the second one straight after the first is turned away with Retry-After: 1
+    server = start_mock_server(games=1, events_per_period=10, rate=1, burst=1)
+    transport = Transport(session=session, rate=None, retries=2, backoff=0)
+    try:
+        assert transport.get(feed_url(server)).status_code == 200
+        start = time.monotonic()
+        resp = transport.get(feed_url(server))
+        waited = time.monotonic() - start
+        stats = server.snapshot()
+    finally:
+        server.stop()
+    assert resp.status_code == 200
+    assert stats['statuses'] == {'200': 2, '429': 1}
+    assert waited >= 1
+    assert transport.stats['retries'] == 1
+
+def test_does_not_retry_404(session):
+    server = start_mock_server(games=1, events_per_period=10)
+    transport = Transport(session=session, rate=None, retries=3, backoff=0)
+    try:
+        resp = transport.get(server.url + '/not/a/feed')
+        stats = server.snapshot()
+    finally:
+        server.stop()
+    assert resp.status_code == 404
+    assert stats['requests'] == 1
+    assert transport.stats == {'requests': 1, 'retries': 0, 'errors': 0}
+
+def test_read_timeout_on_a_stalled_socket(session):
+    # accepts the connection and never answers
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(4)
+    accepted = []
+    def accept():
+        while True:
+            try:
+                accepted.append(listener.accept()[0])
+            except OSError:
+                return
+    threading.Thread(target=accept, daemon=True).start()
+    url = 'http://127.0.0.1:{}/'.format(listener.getsockname()[1])
+    transport = Transport(session=session, timeout=(1, 0.3), rate=None, retries=1, backoff=0)
+    try:
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            transport.get(url)
+    finally:
+        listener.close()
+        for conn in accepted:
+            conn.close()
+    assert transport.stats == {'requests': 2, 'retries': 1, 'errors': 2}
+
+def test_token_bucket_rate():
+    bucket = TokenBucket(rate=20, burst=5)
+    start = time.monotonic()
+    for _ in range(25):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+    # the burst goes straight away, the other 20 at 20 a second
+    assert 0.9 <= elapsed < 1.5
+    assert 0 < bucket.try_acquire() <= 1 / 20
+
+def test_adaptive_limit_grows_on_fast_responses():
+    limit = AdaptiveLimit(initial=4, maximum=5)
+    for _ in range(4):
+        limit.acquire()
+        limit.release(0.1, True)
+    # about one more for every limit clean responses
+    assert 4.8 < limit.limit < 5
+    for _ in range(10):
+        limit.acquire()
+        limit.release(0.1, True)
+    assert limit.limit == 5
+
+def test_adaptive_limit_halves_on_errors_and_slow_responses():
+    limit = AdaptiveLimit(initial=8, minimum=1, target_latency=2.0, cooldown=60)
+    limit.acquire()
+    limit.release(0.1, False)
+    assert limit.limit == 4
+    # a burst of failures inside the cooldown only halves it once
+    limit.acquire()
+    limit.release(0.1, False)
+    assert limit.limit == 4
+    limit.cooldown = 0
+    limit.acquire()
+    limit.release(5.0, True)
+    assert limit.limit == 2
+    for _ in range(3):
+        limit.acquire()
+        limit.release(5.0, True)
+    assert limit.limit == 1
+    assert limit.in_flight == 0
+
+def test_adaptive_limit_caps_requests_in_flight():
+    limit = AdaptiveLimit(initial=2)
+    limit.acquire()
+    limit.acquire()
+    third = threading.Thread(target=limit.acquire)
+    third.start()
+    third.join(0.2)
+    assert third.is_alive()
+    limit.release(0.1, True)
+    third.join(1)
+    assert not third.is_alive()
+    assert limit.in_flight == 2